@@ -43,10 +43,30 @@ PATIENT_COLOR = {
 # VISION PIPELINE
 # =============================================================================
 CAMERA_INDEX = 0            # webcam index (0 = default)
+# Optional GStreamer capture (Jetson / NVIDIA hosts): hardware JPEG decode and
+# colour conversion, appsink drops stale frames instead of queueing them.
+# None = plain cv2.VideoCapture(CAMERA_INDEX). Example:
+# CAMERA_GSTREAMER_PIPELINE = (
+#     "v4l2src device=/dev/video0 ! image/jpeg,width=1280,height=720 ! nvjpegdec ! "
+#     "video/x-raw(memory:NVMM),format=NV12 ! nvvideoconvert ! video/x-raw,format=BGRx ! "
+#     "videoconvert ! video/x-raw,format=BGR ! appsink drop=1 max-buffers=2"
+# )
+CAMERA_GSTREAMER_PIPELINE = None
 FRAME_WIDTH = 1280
 FRAME_HEIGHT = 720
 DETECTION_CONFIDENCE = 0.5  # YOLO confidence threshold
 YOLO_MODEL = "yolov8n.pt"   # Use nano model for speed
+YOLO_ENGINE = "yolov8n.engine"  # TensorRT FP16 export of YOLO_MODEL (used on CUDA if present)
+YOLO_MODEL_INT8 = "yolov8n_int8.engine"  # INT8 engine from vision/calibrate_int8.py
+YOLO_USE_INT8 = True        # prefer the INT8 engine on CUDA (False = FP16 engine for A/B)
+YOLO_IMGSZ = 640            # inference size (must match the engine export)
+TARGET_FPS = 30             # processing loop cadence
+JPEG_QUALITY_MAX = 80       # stream quality when the UI keeps up
+JPEG_QUALITY_MIN = 40       # floor when the UI falls behind
+FRAME_SHARED_MEMORY = True  # pass raw frames to the UI via shared memory (False = JPEG over the queue)
+FRAME_SHM_SLOTS = 3         # shared-memory frame ring size
+BRIDGE_BATCH_SIZE = 4       # messages per queue put
+BRIDGE_BATCH_WINDOW = 0.066 # seconds before a partial batch is flushed (~2 frames)
 
 # =============================================================================
 # UI SETTINGS
@@ -6,10 +6,42 @@ Entities for Re-ID based patient tracking with NEWS2 scoring.
 
 from dataclasses import dataclass, field
 from typing import Literal, Optional, List
+from bisect import bisect_left
+import math
 import time
 import numpy as np
 
 
+def _below(x: float) -> float:
+    """Largest float below x, so a '>= x' cut point works with bisect_left."""
+    return math.nextafter(x, -math.inf)
+
+
+# =============================================================================
+# NEWS2 SCORING TABLES
+# =============================================================================
+# A vital scores POINTS[bisect_left(THRESHOLDS, value)], i.e. the points for
+# the first threshold it is <= to (np.digitize(..., right=True) when batched).
+RR_THRESHOLDS = (8, 11, _below(21), _below(25))              # <=8, 9-11, 12-20, 21-24, >=25
+RR_POINTS = (3, 1, 0, 2, 3)
+
+SPO2_THRESHOLDS = (91, 93, 95)                               # <=91, 92-93, 94-95, >=96
+SPO2_POINTS = (3, 2, 1, 0)
+
+SBP_THRESHOLDS = (90, 100, 110, _below(220))                 # <=90, 91-100, 101-110, 111-219, >=220
+SBP_POINTS = (3, 2, 1, 0, 3)
+
+PULSE_THRESHOLDS = (40, 50, _below(91), _below(111), _below(131))  # <=40, 41-50, 51-90, 91-110, 111-130, >=131
+PULSE_POINTS = (3, 1, 0, 1, 2, 3)
+
+TEMP_THRESHOLDS = (35.0, 36.0, _below(38.1), _below(39.1))   # <=35.0, -36.0, -38.0, 38.1-39.0, >=39.1
+TEMP_POINTS = (3, 1, 0, 1, 2)
+
+# Consciousness (ACVPU) as a code; unknown levels count as not Alert
+CONSCIOUSNESS_CODES = {"Alert": 0, "Voice": 1, "Pain": 2, "Unresponsive": 3}
+CONSCIOUSNESS_POINTS = (0, 3, 3, 3)
+
+
 @dataclass
 class PatientRecord:
     """
@@ -60,51 +92,14 @@ class PatientRecord:
         Calculate NEWS2 score from vital signs.
         Simplified version - real NEWS2 has more complex scoring.
         """
-        score = 0
-
-        # Respiratory rate scoring
-        if self.respiratory_rate <= 8 or self.respiratory_rate >= 25:
-            score += 3
-        elif self.respiratory_rate >= 21:
-            score += 2
-        elif self.respiratory_rate <= 11:
-            score += 1
-
-        # Oxygen saturation scoring
-        if self.oxygen_saturation <= 91:
-            score += 3
-        elif self.oxygen_saturation <= 93:
-            score += 2
-        elif self.oxygen_saturation <= 95:
-            score += 1
-
-        # Systolic BP scoring
-        if self.systolic_bp <= 90 or self.systolic_bp >= 220:
-            score += 3
-        elif self.systolic_bp <= 100:
-            score += 2
-        elif self.systolic_bp <= 110:
-            score += 1
-
-        # Pulse scoring
-        if self.pulse <= 40 or self.pulse >= 131:
-            score += 3
-        elif self.pulse >= 111:
-            score += 2
-        elif self.pulse <= 50 or self.pulse >= 91:
-            score += 1
-
-        # Temperature scoring
-        if self.temperature <= 35.0:
-            score += 3
-        elif self.temperature >= 39.1:
-            score += 2
-        elif self.temperature <= 36.0 or self.temperature >= 38.1:
-            score += 1
-
-        # Consciousness scoring
-        if self.consciousness != "Alert":
-            score += 3
+        score = (
+            RR_POINTS[bisect_left(RR_THRESHOLDS, self.respiratory_rate)]
+            + SPO2_POINTS[bisect_left(SPO2_THRESHOLDS, self.oxygen_saturation)]
+            + SBP_POINTS[bisect_left(SBP_THRESHOLDS, self.systolic_bp)]
+            + PULSE_POINTS[bisect_left(PULSE_THRESHOLDS, self.pulse)]
+            + TEMP_POINTS[bisect_left(TEMP_THRESHOLDS, self.temperature)]
+            + CONSCIOUSNESS_POINTS[CONSCIOUSNESS_CODES.get(self.consciousness, 3)]
+        )
 
         self.news2_score = score
         return score
@@ -155,12 +150,19 @@ class CameraZone:
     camera_width: int = 1280
     camera_height: int = 720
 
+    def __post_init__(self):
+        # Camera -> map scale factors, computed once
+        self._sx = self.map_width / self.camera_width
+        self._sy = self.map_height / self.camera_height
+
     def camera_to_map(self, cam_x: int, cam_y: int) -> tuple[int, int]:
         """Convert camera pixel coordinates to floor plan coordinates."""
-        scale_x = self.map_width / self.camera_width
-        scale_y = self.map_height / self.camera_height
-
-        map_x = self.map_x + int(cam_x * scale_x)
-        map_y = self.map_y + int(cam_y * scale_y)
-
-        return (map_x, map_y)
+        return (self.map_x + int(cam_x * self._sx), self.map_y + int(cam_y * self._sy))
+
+    def camera_to_map_batch(self, cam_x: np.ndarray, cam_y: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Convert arrays of camera coordinates to floor plan coordinates (int32)."""
+        map_x = (np.asarray(cam_x) * self._sx).astype(np.int32)
+        map_y = (np.asarray(cam_y) * self._sy).astype(np.int32)
+        map_x += self.map_x
+        map_y += self.map_y
+        return map_x, map_y
@@ -10,6 +10,7 @@ from dataclasses import dataclass, field
 from PIL import Image
 import io
 import base64
+import numpy as np
 
 from .entities import CameraZone
 
@@ -22,6 +23,7 @@ class FloorPlan:
     def __init__(self):
         self._image: Optional[Image.Image] = None
         self._image_path: Optional[str] = None
+        self._b64_cache: Optional[str] = None  # encoded image, cleared on every load
         self._zones: Dict[str, CameraZone] = {}
 
     @property
@@ -39,22 +41,26 @@ class FloorPlan:
         """Load floor plan image from file."""
         self._image = Image.open(path)
         self._image_path = path
+        self._b64_cache = None
 
     def load_image_bytes(self, data: bytes, format: str = "PNG"):
         """Load floor plan from bytes (for Streamlit upload)."""
         self._image = Image.open(io.BytesIO(data))
+        self._b64_cache = None
 
     def get_image(self) -> Optional[Image.Image]:
         """Get the floor plan image."""
         return self._image
 
     def get_image_base64(self) -> str:
-        """Get floor plan as base64 string for web display."""
+        """Get floor plan as base64 string for web display (encoded once per load)."""
         if not self._image:
             return ""
-        buffer = io.BytesIO()
-        self._image.save(buffer, format="PNG")
-        return base64.b64encode(buffer.getvalue()).decode()
+        if self._b64_cache is None:
+            buffer = io.BytesIO()
+            self._image.save(buffer, format="PNG", optimize=False, compress_level=1)
+            self._b64_cache = base64.b64encode(buffer.getbuffer()).decode()
+        return self._b64_cache
 
     # Zone management
     def add_zone(self, zone: CameraZone):
@@ -84,6 +90,18 @@ class FloorPlan:
             return zone.camera_to_map(cam_x, cam_y)
         return (0, 0)
 
+    def camera_to_map_batch(self, camera_id: str, positions: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """
+        Convert many camera positions from one camera at once.
+        Returns (0, 0) for each if camera zone not found.
+        """
+        zone = self._zones.get(camera_id)
+        if not zone or not positions:
+            return [(0, 0)] * len(positions)
+        cam = np.asarray(positions)
+        map_x, map_y = zone.camera_to_map_batch(cam[:, 0], cam[:, 1])
+        return list(zip(map_x.tolist(), map_y.tolist()))
+
     # Demo setup
     def setup_demo_zones(self):
         """
@@ -143,4 +161,5 @@ class FloorPlan:
         draw.text((620, 320), "Treatment", fill='#8888aa')
 
         self._image = img
+        self._b64_cache = None
         return img
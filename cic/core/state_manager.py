@@ -71,31 +71,65 @@ class StateManager:
         Automatically converts to map coordinates if zone is configured.
         """
         with self._lock:
-            # Convert to map coordinates
-            map_pos = self.floor_plan.camera_to_map(camera_id, position[0], position[1])
+            return self._update_tracked_locked(track_id, camera_id, position, person_type, time.time())
 
-            if track_id in self._tracked:
-                # Update existing
-                person = self._tracked[track_id]
-                person.position = position
-                person.map_position = map_pos
-                person.person_type = person_type
-                person.last_seen = time.time()
-            else:
-                # Create new
-                person = TrackedPerson(
-                    track_id=track_id,
-                    position=position,
-                    map_position=map_pos,
-                    person_type=person_type
-                )
-                self._tracked[track_id] = person
-
-            # Restore patient tag if exists
-            if track_id in self._tags:
-                person.patient_id = self._tags[track_id]
+    def update_tracked_batch(
+        self,
+        track_ids: List[str],
+        camera_id: str,
+        positions: List[tuple[int, int]],
+        person_types: List[str]
+    ) -> List[TrackedPerson]:
+        """
+        Update or create many tracked people from one camera frame.
+        Takes the lock once for the whole frame instead of once per person.
+        """
+        with self._lock:
+            now = time.time()
+            # Convert all positions to map coordinates in one go
+            map_positions = self.floor_plan.camera_to_map_batch(camera_id, positions)
+            return [
+                self._update_tracked_locked(track_id, camera_id, position, person_type, now, map_pos)
+                for track_id, position, person_type, map_pos
+                in zip(track_ids, positions, person_types, map_positions)
+            ]
 
-            return person
+    def _update_tracked_locked(
+        self,
+        track_id: str,
+        camera_id: str,
+        position: tuple[int, int],
+        person_type: str,
+        now: float,
+        map_pos: Optional[tuple[int, int]] = None
+    ) -> TrackedPerson:
+        """Update one tracked person. Caller must hold self._lock."""
+        # Convert to map coordinates
+        if map_pos is None:
+            map_pos = self.floor_plan.camera_to_map(camera_id, position[0], position[1])
+
+        if track_id in self._tracked:
+            # Update existing
+            person = self._tracked[track_id]
+            person.position = position
+            person.map_position = map_pos
+            person.person_type = person_type
+            person.last_seen = now
+        else:
+            # Create new
+            person = TrackedPerson(
+                track_id=track_id,
+                position=position,
+                map_position=map_pos,
+                person_type=person_type
+            )
+            self._tracked[track_id] = person
+
+        # Restore patient tag if exists
+        if track_id in self._tags:
+            person.patient_id = self._tags[track_id]
+
+        return person
 
     def remove_tracked(self, track_id: str):
         """Remove a tracked person (lost tracking)."""
@@ -158,6 +192,11 @@ class StateManager:
             self.cleanup_stale()
             return list(self._tracked.values())
 
+    def get_tracked_by_id(self) -> Dict[str, TrackedPerson]:
+        """Snapshot of tracked people keyed by track_id (O(1) lookups)."""
+        with self._lock:
+            return dict(self._tracked)
+
     def get_tracked_patients(self) -> List[Tuple[TrackedPerson, PatientRecord]]:
         """Get all tracked people who are tagged as patients, with their records."""
         with self._lock:
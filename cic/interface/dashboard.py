@@ -22,16 +22,25 @@ root_dir = os.path.dirname(parent_dir)
 sys.path.insert(0, root_dir)
 sys.path.insert(0, parent_dir)
 
+# Risk level -> BGR box color (built once, not per track)
+RISK_COLORS = {"high": (0, 0, 255), "medium": (0, 255, 255), "low": (0, 255, 0)}
+
+# Draw through OpenCV's T-API (OpenCL, e.g. iGPU) when available
+USE_OPENCL = cv2.ocl.haveOpenCL()
+if USE_OPENCL:
+    cv2.ocl.setUseOpenCL(True)
+    USE_OPENCL = cv2.ocl.useOpenCL()
+
 try:
     from cic.core.state_manager import StateManager
     from cic.vision.detector import PersonDetector
-    from cic.vision.tracker import CentroidTracker
+    from cic.vision.tracker import YoloNativeTracker
     from cic.vision.classifier import UniformClassifier
     from cic.vision.reid import ReIDExtractor, ReIDMatcher
 except ImportError:
     from core.state_manager import StateManager
     from vision.detector import PersonDetector
-    from vision.tracker import CentroidTracker
+    from vision.tracker import YoloNativeTracker
     from vision.classifier import UniformClassifier
     from vision.reid import ReIDExtractor, ReIDMatcher
 
@@ -45,7 +54,7 @@ def get_detector():
 @st.cache_resource
 def get_tracker():
     """Cache the tracker."""
-    return CentroidTracker(max_distance=80, max_missed=15)
+    return YoloNativeTracker(max_missed=15)
 
 
 @st.cache_resource
@@ -86,26 +95,21 @@ def process_frame(frame, detector, tracker, classifier, reid_extractor, reid_mat
     # Track people
     tracks = tracker.update(detections)
 
-    # Process each tracked person
-    for track_id, tracked in tracks.items():
-        # Classify as staff/patient
-        person_type = classifier.classify(frame, tracked.bbox)
+    track_ids = list(tracks.keys())
+    centroids = [t.centroid for t in tracks.values()]
 
-        # Extract Re-ID signature
-        signature = reid_extractor.extract_signature(frame, tracked.bbox)
+    # Classify as staff/patient (one HSV conversion over the tiled torsos)
+    person_types = classifier.classify_tiled(frame, [t.bbox for t in tracks.values()]) if tracks else []
 
-        # Try to match against enrolled patients
-        match = reid_matcher.match(signature)
+    # Extract Re-ID signatures and match against enrolled patients in one product
+    signatures = [reid_extractor.extract_signature(frame, t.bbox) for t in tracks.values()]
+    matches = reid_matcher.match_batch(np.stack(signatures)) if signatures else []
 
-        # Update state manager
-        person = sm.update_tracked(
-            track_id=track_id,
-            camera_id="cam_webcam",
-            position=tracked.centroid,
-            person_type=person_type
-        )
+    # Update state manager (one lock for the whole frame)
+    people = sm.update_tracked_batch(track_ids, "cam_webcam", centroids, person_types)
 
-        # If matched, link to patient
+    # If matched, link to patient
+    for track_id, person, match in zip(track_ids, people, matches):
         if match and not person.patient_id:
             sm.tag_patient(track_id, match.patient_id)
 
@@ -114,28 +118,35 @@ def process_frame(frame, detector, tracker, classifier, reid_extractor, reid_mat
 
 def draw_detections(frame, tracks, classifier, reid_matcher, sm):
     """Draw bounding boxes and labels on frame."""
-    frame = frame.copy()
+    # Draw on a copy; with OpenCL the copy is a device-side UMat
+    canvas = cv2.UMat(frame) if USE_OPENCL else frame.copy()
+
+    # Box outlines are grouped by color and drawn with one polylines call each,
+    # before any label so labels stay on top of the boxes
+    boxes_by_color = {}
+    annotations = []  # (label, color, top-left, centroid), drawn after the boxes
+
+    # One snapshot of tracked state instead of a scan per track
+    tracked_by_id = sm.get_tracked_by_id()
 
     for track_id, tracked in tracks.items():
         x1, y1, x2, y2 = tracked.bbox
         cx, cy = tracked.centroid
 
-        # Get person info
-        person_type = classifier.classify(frame, tracked.bbox)
-
         # Check if enrolled
-        person = None
-        for p in sm.get_all_tracked():
-            if p.track_id == track_id:
-                person = p
-                break
+        person = tracked_by_id.get(track_id)
+
+        # Get person info (process_frame already classified this track)
+        if person is not None:
+            person_type = person.person_type
+        else:
+            person_type = classifier.classify(frame, tracked.bbox)
 
         # Determine color and label
         if person and person.patient_id:
             record = sm.elr.get_patient(person.patient_id)
             if record:
-                color_map = {"high": (0, 0, 255), "medium": (0, 255, 255), "low": (0, 255, 0)}
-                color = color_map.get(record.risk_level, (128, 128, 128))
+                color = RISK_COLORS.get(record.risk_level, (128, 128, 128))
                 label = f"{record.patient_id} NEWS2:{record.news2_score}"
             else:
                 color = (128, 128, 128)
@@ -147,21 +158,30 @@ def draw_detections(frame, tracks, classifier, reid_matcher, sm):
             color = (128, 128, 128)  # Gray
             label = f"{track_id} [?]"
 
-        # Draw bounding box
-        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+        # Queue bounding box and label
+        boxes_by_color.setdefault(color, []).append(tracked.bbox)
+        annotations.append((label, color, (x1, y1), (cx, cy)))
+
+    # Draw bounding boxes: (N, 4) xyxy -> (N, 4, 2) corner quads
+    for color, bboxes in boxes_by_color.items():
+        b = np.array(bboxes, dtype=np.int32)
+        quads = b[:, [0, 1, 2, 1, 2, 3, 0, 3]].reshape(-1, 4, 2)
+        cv2.polylines(canvas, list(quads), True, color, 2)
 
+    for label, color, (x1, y1), (cx, cy) in annotations:
         # Draw label background
         label_size = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 2)[0]
-        cv2.rectangle(frame, (x1, y1 - 25), (x1 + label_size[0] + 10, y1), color, -1)
+        cv2.rectangle(canvas, (x1, y1 - 25), (x1 + label_size[0] + 10, y1), color, -1)
 
         # Draw label
-        cv2.putText(frame, label, (x1 + 5, y1 - 7),
+        cv2.putText(canvas, label, (x1 + 5, y1 - 7),
                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
 
         # Draw center point
-        cv2.circle(frame, (cx, cy), 5, color, -1)
+        cv2.circle(canvas, (cx, cy), 5, color, -1)
 
-    return frame
+    # Back to host memory only once, after all drawing
+    return canvas.get() if USE_OPENCL else canvas
 
 
 def render_map(sm) -> Image.Image:
@@ -5,13 +5,52 @@ Connects CV processing to UI via multiprocessing Queue.
 """
 
 from dataclasses import dataclass, field
-from typing import List, Optional
-from multiprocessing import Queue
+from typing import List, Optional, Union
+from collections import deque
+from multiprocessing import Queue, shared_memory
 from queue import Empty, Full
 import time
 import cv2
 import numpy as np
 
+# nvJPEG via torchvision: resolved on the first encode, so processes that only
+# decode (the UI) never import torch or initialise CUDA
+_gpu_jpeg_ok: Optional[bool] = None
+
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR, TJSAMP_420
+    _turbo = TurboJPEG()  # raises if the libturbojpeg shared library is missing
+    TURBOJPEG_AVAILABLE = True
+except (ImportError, OSError, RuntimeError):
+    _turbo = None
+    TURBOJPEG_AVAILABLE = False
+
+
+def _jpeg_params(quality: int) -> List[int]:
+    """Fixed cv2.imencode flags: no Huffman optimisation pass, 4:2:0 chroma."""
+    params = [cv2.IMWRITE_JPEG_QUALITY, quality, cv2.IMWRITE_JPEG_OPTIMIZE, 0]
+    # Explicit sampling factor needs OpenCV >= 4.5.5
+    if hasattr(cv2, "IMWRITE_JPEG_SAMPLING_FACTOR"):
+        params += [cv2.IMWRITE_JPEG_SAMPLING_FACTOR, cv2.IMWRITE_JPEG_SAMPLING_FACTOR_420]
+    return params
+
+
+# Encoder flags per quality level, built once (adaptive quality moves in steps of 10)
+_JPEG_PARAMS = {q: _jpeg_params(q) for q in range(10, 101, 10)}
+
+
+def _gpu_jpeg_available() -> bool:
+    """Import torch/torchvision on first use; True if CUDA JPEG encode can be tried."""
+    global _gpu_jpeg_ok
+    if _gpu_jpeg_ok is None:
+        try:
+            import torch
+            from torchvision.io import encode_jpeg  # noqa: F401
+            _gpu_jpeg_ok = torch.cuda.is_available()
+        except ImportError:
+            _gpu_jpeg_ok = False
+    return _gpu_jpeg_ok
+
 
 @dataclass
 class EntityUpdate:
@@ -29,8 +68,53 @@ class PipelineMessage:
     timestamp: float = field(default_factory=time.time)
     camera_id: str = ""
     entities: List[EntityUpdate] = field(default_factory=list)
-    frame_jpeg: Optional[bytes] = None
+    frame_jpeg: Optional[bytes] = None     # None when the encode was skipped
+    frame_shm: Optional[str] = None        # shared-memory slot name (raw BGR frame)
+    frame_shape: tuple = ()                # (H, W, 3) of the shared-memory frame
+    frame_seq: int = 0                     # slot sequence number when sent
     fps: float = 0.0
+    jpeg_quality: int = 80                 # current adaptive quality
+    bytes_per_sec: float = 0.0             # recent JPEG throughput
+
+
+class SharedFrameRing:
+    """
+    Ring of shared-memory slots holding raw BGR frames (same-host CV -> UI).
+
+    Messages carry only the slot name, so the queue no longer pickles
+    megabytes of pixels per frame. Each slot starts with an int64 sequence
+    number so a reader can tell when the writer has reused the slot.
+    """
+
+    HEADER = 8  # bytes: int64 sequence number
+
+    def __init__(self, shape: tuple, slots: int = 3):
+        self.shape = tuple(shape)
+        size = self.HEADER + int(np.prod(self.shape))
+        self._shm = [shared_memory.SharedMemory(create=True, size=size) for _ in range(slots)]
+        self._seqs = [np.ndarray((1,), np.int64, buffer=s.buf) for s in self._shm]
+        self._frames = [np.ndarray(self.shape, np.uint8, buffer=s.buf, offset=self.HEADER) for s in self._shm]
+        self._next = 0
+        self._seq = 0
+
+    def write(self, frame: np.ndarray) -> tuple[str, int]:
+        """Copy a frame into the next slot. Returns (slot name, sequence number)."""
+        i = self._next
+        self._next = (i + 1) % len(self._shm)
+        self._seq += 1
+
+        self._seqs[i][0] = -1  # mark the slot as mid-write
+        np.copyto(self._frames[i], frame)
+        self._seqs[i][0] = self._seq
+        return self._shm[i].name, self._seq
+
+    def close(self):
+        """Release and remove all slots (writer side)."""
+        self._seqs, self._frames = [], []
+        for shm in self._shm:
+            shm.close()
+            shm.unlink()
+        self._shm = []
 
 
 class PipelineBridge:
@@ -41,49 +125,128 @@ class PipelineBridge:
     def __init__(self, queue: Optional[Queue] = None, max_size: int = 10):
         self.queue = queue if queue else Queue(maxsize=max_size)
         self.max_size = max_size
+        self._attached: dict[str, shared_memory.SharedMemory] = {}  # reader-side slots
+        self._pending: deque = deque()  # unpacked messages from a received batch
 
-    def send(self, message: PipelineMessage):
-        """Send a message to the UI process (non-blocking)."""
+    def send(self, message: Union[PipelineMessage, List[PipelineMessage]]):
+        """
+        Send a message, or a batch of messages as one item, to the UI process
+        (non-blocking).
+
+        Tries the put first and only drops the oldest message when the put
+        actually fails, so the common case is a single queue operation and
+        there is no full()-then-put race.
+        """
+        try:
+            self.queue.put_nowait(message)
+            return
+        except Full:
+            pass
+
+        # Drop oldest, then retry once
+        try:
+            self.queue.get_nowait()
+        except Empty:
+            pass
         try:
-            # Drop oldest if full
-            if self.queue.full():
-                try:
-                    self.queue.get_nowait()
-                except Empty:
-                    pass
             self.queue.put_nowait(message)
         except Full:
-            pass  # Skip this frame
+            pass  # Another sender refilled it: skip this frame
+
+    def is_backlogged(self) -> bool:
+        """True if the UI is not draining messages as fast as they are sent."""
+        return self.queue.full()
 
     def receive(self, timeout: float = 0.1) -> Optional[PipelineMessage]:
-        """Receive a message from the CV process."""
+        """Receive a message from the CV process (batches are unpacked in order)."""
+        if self._pending:
+            return self._pending.popleft()
         try:
-            return self.queue.get(timeout=timeout)
+            item = self.queue.get(timeout=timeout)
         except Empty:
             return None
+        if isinstance(item, list):
+            self._pending.extend(item)
+            return self._pending.popleft() if self._pending else None
+        return item
 
     def receive_latest(self) -> Optional[PipelineMessage]:
         """Receive the most recent message, discarding older ones."""
-        message = None
+        message = self._pending[-1] if self._pending else None
+        self._pending.clear()
         try:
             while True:
-                message = self.queue.get_nowait()
+                item = self.queue.get_nowait()
+                if isinstance(item, list):
+                    message = item[-1] if item else message
+                else:
+                    message = item
         except Empty:
             pass
         return message
 
+    def get_frame(self, message: PipelineMessage) -> Optional[np.ndarray]:
+        """
+        Frame for a received message, from JPEG or shared memory.
+
+        Shared-memory frames are zero-copy views, valid until the writer
+        cycles back to the slot; copy them if they must be kept. Returns
+        None if the slot has already been reused.
+        """
+        if message.frame_jpeg:
+            return self.decode_frame(message.frame_jpeg)
+        if not message.frame_shm:
+            return None
+
+        shm = self._attached.get(message.frame_shm)
+        if shm is None:
+            try:
+                shm = shared_memory.SharedMemory(name=message.frame_shm)
+            except FileNotFoundError:
+                return None  # writer has shut down
+            self._attached[message.frame_shm] = shm
+
+        if np.ndarray((1,), np.int64, buffer=shm.buf)[0] != message.frame_seq:
+            return None
+        return np.ndarray(message.frame_shape, np.uint8, buffer=shm.buf, offset=SharedFrameRing.HEADER)
+
     @staticmethod
-    def encode_frame(frame: np.ndarray) -> bytes:
-        """Encode a numpy BGR frame to JPEG bytes."""
+    def encode_frame(frame: np.ndarray, quality: int = 80) -> bytes:
+        """
+        Encode a numpy BGR frame to JPEG bytes.
+
+        Prefers nvJPEG on CUDA, then libjpeg-turbo (SIMD) via PyTurboJPEG,
+        then OpenCV's encoder.
+        """
+        global _gpu_jpeg_ok
         if frame is None:
             return b''
-        _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
+        if _gpu_jpeg_available():
+            try:
+                return PipelineBridge._encode_frame_gpu(frame, quality)
+            except (RuntimeError, TypeError, AttributeError):
+                _gpu_jpeg_ok = False  # Older torchvision without CUDA encode: CPU from now on
+        if TURBOJPEG_AVAILABLE:
+            return _turbo.encode(frame, quality=quality, pixel_format=TJPF_BGR, jpeg_subsample=TJSAMP_420)
+        params = _JPEG_PARAMS.get(quality) or _jpeg_params(quality)
+        _, buffer = cv2.imencode('.jpg', frame, params)
         return buffer.tobytes()
 
+    @staticmethod
+    def _encode_frame_gpu(frame: np.ndarray, quality: int = 80) -> bytes:
+        """JPEG-encode on the GPU via torchvision (HWC BGR -> CHW RGB)."""
+        import torch
+        from torchvision.io import encode_jpeg
+        img = torch.from_numpy(np.ascontiguousarray(frame)).to('cuda', non_blocking=True)
+        img = img.flip(-1).permute(2, 0, 1).contiguous()
+        return encode_jpeg(img, quality=quality).cpu().numpy().tobytes()
+
     @staticmethod
     def decode_frame(jpeg_bytes: bytes) -> Optional[np.ndarray]:
         """Decode JPEG bytes back to numpy BGR frame."""
         if not jpeg_bytes:
             return None
+        if TURBOJPEG_AVAILABLE:
+            return _turbo.decode(jpeg_bytes, pixel_format=TJPF_BGR)
         arr = np.frombuffer(jpeg_bytes, dtype=np.uint8)
         return cv2.imdecode(arr, cv2.IMREAD_COLOR)
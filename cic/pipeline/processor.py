@@ -6,12 +6,18 @@ Main computer vision processing loop. Runs in a separate process.
 Pipeline per frame:
 1. Capture frame from webcam
 2. Detect people (YOLO)
-3. Track people (assign persistent IDs)
+3. Track people (YOLO tracker IDs)
 4. Classify as staff/patient (uniform color)
-5. Send updates to UI via bridge
+5. Send updates to UI via bridge (raw frame in shared memory, or JPEG)
+
+Capture (1), inference (2-4) and encode/send (5) run as three threads
+joined by small drop-oldest queues, so each stage overlaps the others.
 """
 
 import time
+import queue
+import threading
+from collections import deque
 from multiprocessing import Process, Queue
 import sys
 import os
@@ -19,11 +25,11 @@ import os
 # Add parent to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from .bridge import PipelineBridge, PipelineMessage, EntityUpdate
+from .bridge import PipelineBridge, PipelineMessage, EntityUpdate, SharedFrameRing
 
 # Vision components
 from cic.vision.detector import PersonDetector
-from cic.vision.tracker import CentroidTracker
+from cic.vision.tracker import YoloNativeTracker
 from cic.vision.classifier import UniformClassifier
 
 try:
@@ -32,6 +38,21 @@ except ImportError:
     import config
 
 
+def _put_latest(q: queue.Queue, item):
+    """Put without blocking; if the queue is full, drop its oldest item first."""
+    try:
+        q.put_nowait(item)
+    except queue.Full:
+        try:
+            q.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            q.put_nowait(item)
+        except queue.Full:
+            pass
+
+
 class CVProcessor:
     """
     Main CV processing pipeline.
@@ -59,30 +80,60 @@ class CVProcessor:
             if self.process.is_alive():
                 self.process.terminate()
 
-    def _run(self):
-        """Main processing loop."""
+    @staticmethod
+    def _open_camera():
+        """
+        Open the capture device.
+
+        Uses config.CAMERA_GSTREAMER_PIPELINE (hardware decode) when set and
+        OpenCV was built with GStreamer; otherwise the default backend.
+        """
         import cv2
 
-        # Initialize camera
+        pipeline = getattr(config, "CAMERA_GSTREAMER_PIPELINE", None)
+        if pipeline:
+            cap = cv2.VideoCapture(pipeline, cv2.CAP_GSTREAMER)
+            if cap.isOpened():
+                print("Camera opened via GStreamer pipeline")
+                return cap
+            print("GStreamer pipeline failed to open - falling back to default capture")
+
         cap = cv2.VideoCapture(config.CAMERA_INDEX)
         cap.set(cv2.CAP_PROP_FRAME_WIDTH, config.FRAME_WIDTH)
         cap.set(cv2.CAP_PROP_FRAME_HEIGHT, config.FRAME_HEIGHT)
+        return cap
+
+    @staticmethod
+    def _run_stage(loop, args, stop: threading.Event, errors: list):
+        """Run a worker stage; an exception is recorded and stops the whole pipeline."""
+        try:
+            loop(*args)
+        except Exception as exc:
+            errors.append(exc)
+            stop.set()
+
+    def _capture_loop(self, cap, frames: queue.Queue, stop: threading.Event):
+        """Stage 1: read frames as fast as the camera delivers them."""
+        while not stop.is_set():
+            ret, frame = cap.read()
+            if not ret:
+                time.sleep(0.1)
+                continue
+            _put_latest(frames, frame)
 
+    def _inference_loop(self, frames: queue.Queue, results: queue.Queue, stop: threading.Event):
+        """Stage 2: detect, track and classify; hands (frame, entities) on."""
         # Initialize vision components
         print("Initializing vision components...")
         detector = PersonDetector(confidence=0.5)
-        tracker = CentroidTracker(max_distance=80, max_missed=15)
+        tracker = YoloNativeTracker(max_missed=15)
         classifier = UniformClassifier()
         print("Vision components ready!")
 
-        fps_time = time.time()
-        frame_count = 0
-        fps = 0
-
-        while self._running:
-            ret, frame = cap.read()
-            if not ret:
-                time.sleep(0.1)
+        while not stop.is_set():
+            try:
+                frame = frames.get(timeout=0.1)
+            except queue.Empty:
                 continue
 
             # 1. Detect people
@@ -91,12 +142,12 @@ class CVProcessor:
             # 2. Track people (assign persistent IDs)
             tracks = tracker.update(detections)
 
-            # 3. Classify and build entity updates
-            entities = []
-            for track_id, tracked in tracks.items():
-                # Classify as staff/patient based on uniform color
-                person_type = classifier.classify(frame, tracked.bbox)
+            # 3. Classify as staff/patient (uniform color, one batch per frame)
+            person_types = classifier.classify_tiled(frame, [t.bbox for t in tracks.values()])
 
+            # 4. Build entity updates
+            entities = []
+            for (track_id, tracked), person_type in zip(tracks.items(), person_types):
                 entities.append(EntityUpdate(
                     entity_id=track_id,
                     camera_id=self.camera_id,
@@ -105,30 +156,133 @@ class CVProcessor:
                     bbox=tracked.bbox
                 ))
 
-            # Calculate FPS
-            frame_count += 1
-            elapsed = time.time() - fps_time
-            if elapsed >= 1.0:
-                fps = frame_count / elapsed
-                frame_count = 0
-                fps_time = time.time()
-
-            # Encode frame for transmission
-            frame_bytes = PipelineBridge.encode_frame(frame)
-
-            # Send message to UI
-            message = PipelineMessage(
-                entities=entities,
-                frame_jpeg=frame_bytes,
-                fps=fps,
-                camera_id=self.camera_id
-            )
-            self.bridge.send(message)
-
-            # Cap at ~30 FPS
-            time.sleep(0.033)
-
-        cap.release()
+            _put_latest(results, (frame, entities))
+
+    def _run(self):
+        """Main processing loop (stage 3: encode and send)."""
+        # Initialize camera
+        cap = self._open_camera()
+
+        stop = threading.Event()
+        errors: list = []  # exceptions raised by the worker stages
+        frames = queue.Queue(maxsize=2)
+        results = queue.Queue(maxsize=2)
+        stages = [
+            threading.Thread(target=self._run_stage,
+                             args=(self._capture_loop, (cap, frames, stop), stop, errors), daemon=True),
+            threading.Thread(target=self._run_stage,
+                             args=(self._inference_loop, (frames, results, stop), stop, errors), daemon=True),
+        ]
+        for t in stages:
+            t.start()
+
+        fps_time = time.time()
+        frame_count = 0
+        fps = 0
+
+        # Deadline pacing + adaptive JPEG quality under backpressure
+        period = 1.0 / config.TARGET_FPS
+        next_t = time.monotonic() + period
+        quality = config.JPEG_QUALITY_MAX
+        backlog = 0          # consecutive late / backlogged frames
+        on_time = 0          # consecutive on-time frames
+        sent = deque(maxlen=30)  # (monotonic time, jpeg bytes) for throughput
+
+        # Same-host transport: raw frames in a shared-memory ring, created on the first frame
+        use_shm = config.FRAME_SHARED_MEMORY
+        ring = None
+
+        # Coalesce messages: one pickle + queue put per batch instead of per frame
+        batch_size, batch_window = config.BRIDGE_BATCH_SIZE, config.BRIDGE_BATCH_WINDOW
+        batch: list = []
+        batch_deadline = 0.0
+
+        try:
+            # A failed stage sets stop, so the loop can't wait forever on a dead thread
+            while self._running and not stop.is_set():
+                try:
+                    frame, entities = results.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+
+                # Calculate FPS
+                frame_count += 1
+                elapsed = time.time() - fps_time
+                if elapsed >= 1.0:
+                    fps = frame_count / elapsed
+                    frame_count = 0
+                    fps_time = time.time()
+
+                # Backpressure: behind schedule or the UI isn't draining the queue
+                now = time.monotonic()
+                if now > next_t + period or self.bridge.is_backlogged():
+                    backlog += 1
+                    on_time = 0
+                else:
+                    backlog = max(0, backlog - 1)
+                    on_time += 1
+
+                skip_encode = False
+                if backlog > 2:
+                    # Lower quality and drop this frame's image (entities still go out)
+                    quality = max(config.JPEG_QUALITY_MIN, quality - 10)
+                    backlog = 0
+                    skip_encode = True
+                elif on_time >= config.TARGET_FPS and quality < config.JPEG_QUALITY_MAX:
+                    # Caught up for ~1s: step quality back up
+                    quality = min(config.JPEG_QUALITY_MAX, quality + 10)
+                    on_time = 0
+
+                # Queue this frame's entities; the batch goes out as one queue item
+                if not batch:
+                    batch_deadline = now + batch_window
+                batch.append(PipelineMessage(
+                    entities=entities,
+                    fps=fps,
+                    camera_id=self.camera_id,
+                    jpeg_quality=quality
+                ))
+                last_frame = None if skip_encode else frame
+
+                if len(batch) >= batch_size or now >= batch_deadline:
+                    # Only the newest frame is shown, so only it is handed over:
+                    # shared-memory slot, else JPEG
+                    message = batch[-1]
+                    if last_frame is not None:
+                        if use_shm:
+                            if ring is None:
+                                ring = SharedFrameRing(last_frame.shape, config.FRAME_SHM_SLOTS)
+                            if last_frame.shape == ring.shape:
+                                message.frame_shm, message.frame_seq = ring.write(last_frame)
+                                message.frame_shape = last_frame.shape
+                        if message.frame_shm is None:
+                            message.frame_jpeg = PipelineBridge.encode_frame(last_frame, quality)
+                    if message.frame_jpeg:
+                        sent.append((now, len(message.frame_jpeg)))
+                    span = sent[-1][0] - sent[0][0] if len(sent) > 1 else 0.0
+                    message.bytes_per_sec = sum(n for _, n in sent) / span if span > 0 else 0.0
+
+                    # Send batch to UI
+                    self.bridge.send(batch)
+                    batch = []
+
+                # Sleep until the next frame deadline (no sleep if already late)
+                delay = next_t - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                    next_t += period
+                else:
+                    next_t = time.monotonic() + period
+
+            if errors:
+                raise RuntimeError("CV pipeline stage failed") from errors[0]
+        finally:
+            stop.set()
+            for t in stages:
+                t.join(timeout=2)
+            cap.release()
+            if ring is not None:
+                ring.close()
 
 
 def run_processor(queue: Queue, camera_id: str = "cam_corridor"):
@@ -16,7 +16,7 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from cic.vision.detector import PersonDetector
-from cic.vision.tracker import CentroidTracker
+from cic.vision.tracker import YoloNativeTracker
 from cic.vision.classifier import UniformClassifier
 from cic.vision.reid import ReIDExtractor, ReIDMatcher
 
@@ -37,7 +37,7 @@ def main():
     detector = PersonDetector(confidence=0.5)
 
     print("Initializing tracker...")
-    tracker = CentroidTracker(max_distance=80, max_missed=15)
+    tracker = YoloNativeTracker(max_missed=15)
 
     print("Initializing classifier...")
     classifier = UniformClassifier()
@@ -76,13 +76,13 @@ def main():
         tracks = tracker.update(detections)
 
         # 3. Process each tracked person
-        for track_id, tracked in tracks.items():
+        # Classify as staff/patient (one HSV conversion over the tiled torsos)
+        person_types = classifier.classify_tiled(frame, [t.bbox for t in tracks.values()])
+
+        for (track_id, tracked), person_type in zip(tracks.items(), person_types):
             x1, y1, x2, y2 = tracked.bbox
             cx, cy = tracked.centroid
 
-            # Classify as staff/patient
-            person_type = classifier.classify(frame, tracked.bbox)
-
             # Extract Re-ID signature
             signature = reid_extractor.extract_signature(frame, tracked.bbox)
 
@@ -1,5 +1,5 @@
 from .detector import PersonDetector, Detection
-from .tracker import CentroidTracker, TrackedPerson
+from .tracker import CentroidTracker, YoloNativeTracker, TrackedPerson
 from .classifier import UniformClassifier
 from .reid import ReIDExtractor, ReIDMatcher, ReIDMatch
 
@@ -7,6 +7,7 @@ __all__ = [
     "PersonDetector",
     "Detection",
     "CentroidTracker",
+    "YoloNativeTracker",
     "TrackedPerson",
     "UniformClassifier",
     "ReIDExtractor",
@@ -16,7 +16,8 @@ app = Flask(__name__)
 # Global variables
 live_patient_data = {} 
 output_map_frame = None 
-data_lock = threading.Lock() 
+output_map_version = 0            # bumped each time the vision loop publishes a map
+map_cond = threading.Condition()  # notified on publish
 
 # Load dummy records
 with open('aegis_flow/vision/patients.json', 'r') as f:
@@ -30,17 +31,34 @@ def index():
 def get_data():
     return jsonify(live_patient_data)
 
+# Multipart part header/trailer, built once
+MJPEG_HEADER = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n'
+MJPEG_TRAILER = b'\r\n'
+MAP_JPEG_PARAMS = [cv2.IMWRITE_JPEG_QUALITY, 80, cv2.IMWRITE_JPEG_OPTIMIZE, 0]  # no Huffman optimisation pass
+
+# Map stream pacing: sleep only what is left of each frame's budget
+MAP_FEED_PERIOD = 1.0 / 30
+
 def generate_map_feed():
-    global output_map_frame
+    # Encode only when the vision loop has published a newer map
+    last_version = 0
+    next_deadline = time.monotonic()
     while True:
-        with data_lock:
-            if output_map_frame is None:
-                continue
-            (flag, encodedImage) = cv2.imencode(".jpg", output_map_frame)
-            if not flag:
-                continue
-        yield(b'--frame\r\n' b'Content-Type: image/jpeg\r\n\r\n' + 
-              bytearray(encodedImage) + b'\r\n')
+        # Sleep outside the lock so the vision loop can publish new frames
+        delay = next_deadline - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        next_deadline = max(next_deadline + MAP_FEED_PERIOD, time.monotonic())
+
+        # Block until there is a new version (published maps are never modified)
+        with map_cond:
+            map_cond.wait_for(lambda: output_map_version != last_version and output_map_frame is not None)
+            map_frame, last_version = output_map_frame, output_map_version
+        (flag, encodedImage) = cv2.imencode(".jpg", map_frame, MAP_JPEG_PARAMS)
+        if not flag:
+            continue
+        # Single copy: join reads the encoder's buffer directly (no bytearray temp)
+        yield b''.join((MJPEG_HEADER, memoryview(encodedImage), MJPEG_TRAILER))
 
 @app.route('/map_feed')
 def map_feed():
@@ -83,6 +101,9 @@ src_points = np.float32([
     [747, 954]   # Bottom-Left
 ])
 
+# Calibration outline as int32 for polylines, drawn every frame
+SRC_POINTS_I32 = np.int32(src_points)
+
 # MIRRORED UP-DOWN (Vertical Flip)
 # Note how the '0' and 'MAP_HEIGHT' values for the Y-axis are swapped compared to before.
 dst_points = np.float32([
@@ -161,7 +182,7 @@ while True:
     
     current_map = map_img.copy()
     cv2.rectangle(current_map, (0,0), (MAP_WIDTH, MAP_HEIGHT), (255, 255, 255), -1)
-    cv2.polylines(frame, [np.int32(src_points)], True, (0, 255, 255), 2)
+    cv2.polylines(frame, [SRC_POINTS_I32], True, (0, 255, 255), 2)
 
     results = yolo_model.track(frame, persist=True, classes=[0], verbose=False)
     current_frame_data = {}
@@ -234,8 +255,10 @@ while True:
                             cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 0), 2)
 
     live_patient_data = current_frame_data
-    with data_lock:
+    with map_cond:
         output_map_frame = current_map.copy()
+        output_map_version += 1
+        map_cond.notify_all()
 
     cv2.imshow("Main System", frame)
     cv2.imshow("2D Map", current_map) 
@@ -2,11 +2,13 @@ import cv2
 import numpy as np
 from ultralytics import YOLO
 import torch
-import torchvision.transforms as T
 import torchvision.models as models
-from scipy.spatial.distance import cosine
 import json
+import os
+from types import MappingProxyType
 import threading
+import queue
+from collections import OrderedDict
 from flask import Flask, render_template, jsonify
 
 # --- 1. SETUP FLASK SERVER ---
@@ -19,6 +21,10 @@ live_patient_data = {}
 with open('cic/vision/patients.json', 'r') as f:
     epr_database = json.load(f)
 
+# Per-patient fields the app shows, extracted once (read-only views)
+EPR_FIELDS = ("name", "epr_id", "condition", "triage_score")
+EPR_RECORDS = [MappingProxyType({k: r[k] for k in EPR_FIELDS}) for r in epr_database]
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -26,7 +32,9 @@ def index():
 @app.route('/data')
 def get_data():
     """API endpoint the mobile app calls to get live locations"""
-    return jsonify(live_patient_data)
+    # Vision loop stores (epr_index, map_x, map_y); records are merged in only when asked for
+    data = live_patient_data
+    return jsonify({gid: {**EPR_RECORDS[i], "map_x": x, "map_y": y} for gid, (i, x, y) in data.items()})
 
 def run_flask():
     # Run server on 0.0.0.0 so external mobile devices can connect
@@ -46,19 +54,28 @@ print(f"Mobile Dashboard: http://localhost:5000")
 # Re-ID Model
 feature_extractor = models.resnet18(weights=models.ResNet18_Weights.IMAGENET1K_V1)
 feature_extractor = torch.nn.Sequential(*(list(feature_extractor.children())[:-1]))
-feature_extractor.to(device)
-feature_extractor.eval()
+# FP16 on the accelerator halves weight/activation traffic; CPU stays FP32
+model_dtype = torch.float32 if device.type == "cpu" else torch.float16
+feature_extractor = feature_extractor.to(device, dtype=model_dtype).eval()
+# Trace once: the frozen graph skips per-layer Python dispatch (batch size stays dynamic)
+with torch.no_grad():
+    feature_extractor = torch.jit.trace(feature_extractor, torch.zeros(1, 3, 224, 224, device=device, dtype=model_dtype))
 
-preprocess = T.Compose([
-    T.ToPILImage(), T.Resize((224, 224)), T.ToTensor(),
-    T.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
-])
+# ImageNet normalization for 0-255 inputs, kept on the device
+MEAN = torch.tensor([0.485, 0.456, 0.406], device=device).view(1, 3, 1, 1) * 255
+STD = torch.tensor([0.229, 0.224, 0.225], device=device).view(1, 3, 1, 1) * 255
+
+def preprocess_batch(image_crops):
+    """BGR uint8 crops -> normalized RGB (N, 3, 224, 224); one upload, normalized on the device (no PIL)"""
+    arr = np.stack([cv2.resize(c, (224, 224), interpolation=cv2.INTER_AREA) for c in image_crops])
+    batch = torch.from_numpy(arr).to(device, non_blocking=True).permute(0, 3, 1, 2).flip(1).float()  # BGR -> RGB
+    return batch.sub_(MEAN).div_(STD).to(model_dtype)
 
 yolo_model = YOLO('yolov8n.pt') 
+YOLO_HALF = device.type != "cpu"  # FP16 detection on the accelerator
 
 # Map Settings
 MAP_WIDTH, MAP_HEIGHT = 600, 600
-map_img = np.zeros((MAP_HEIGHT, MAP_WIDTH, 3), dtype=np.uint8)
 
 # --- CALIBRATION (1920x1080 Mirrored) ---
 src_points = np.float32([
@@ -74,112 +91,241 @@ dst_points = np.float32([
 ])
 matrix = cv2.getPerspectiveTransform(src_points, dst_points)
 
+def build_frame_geometry(frame_w, frame_h):
+    """
+    Camera -> map lookup table and the calibration outline for the frame size
+    the camera actually delivers. Calibration is in mirrored coordinates; the
+    mirror (about the real frame width) is folded in so the raw frame is never flipped.
+    """
+    ys, xs = np.mgrid[0:frame_h, 0:frame_w]
+    grid = np.stack([frame_w - 1 - xs, ys], -1).reshape(-1, 1, 2).astype(np.float32)
+    lut = np.clip(cv2.perspectiveTransform(grid, matrix), -32768, 32767).astype(np.int16).reshape(frame_h, frame_w, 2)
+    # Calibration outline in raw (unmirrored) frame coordinates, drawn every frame
+    outline = np.int32(src_points)
+    outline[:, 0] = frame_w - 1 - outline[:, 0]
+    return lut, outline
+
+# Built from the first frame (and rebuilt if the capture size ever changes)
+FRAME_W, FRAME_H = 0, 0
+PERSP_LUT, SRC_POINTS_I32 = None, None
+
 # Data Stores
-patient_fingerprints = {}  # { global_id : embedding_vector }
 next_global_id = 1
 MATCH_THRESHOLD = 0.25 
-active_track_map = {} # { yolo_id : global_id }
+active_track_map = OrderedDict() # { yolo_id : global_id }, least recently seen first
+TRACK_MAP_CAPACITY = 256  # tracker ids remembered after they leave the frame
+embedded_boxes = {} # { yolo_id : quantized bbox at last embedding }
+
+# Fingerprint store: fixed-capacity float32 rows, least recently seen evicted when full
+FP_CAPACITY = 256
+fp_raw = np.zeros((FP_CAPACITY, 512), dtype=np.float32)     # adaptive (EMA) fingerprints
+fp_matrix = np.zeros((FP_CAPACITY, 512), dtype=np.float32)  # same rows, L2-normalized for matching
+fp_ids = np.full(FP_CAPACITY, -1, dtype=np.int64)          # global id per row
+fp_last_seen = np.zeros(FP_CAPACITY, dtype=np.int64)       # frame index of last sighting
+fp_rows = {}  # { global_id : row }
+fp_count = 0
+frame_idx = 0
+
+def get_embeddings(image_crops):
+    """One forward pass for every crop in the frame -> (N, 512)"""
+    batch = preprocess_batch(image_crops)
+    with torch.no_grad(): features = feature_extractor(batch)
+    return features.flatten(1).float().cpu().numpy()
 
 def get_embedding(image_crop):
-    img_tensor = preprocess(image_crop).unsqueeze(0).to(device)
-    with torch.no_grad(): features = feature_extractor(img_tensor)
-    return features.cpu().numpy().flatten()
+    return get_embeddings([image_crop])[0]
+
+def fingerprint_row(gid):
+    """Row for gid, allocated on first use (evicting the least recently seen when full)"""
+    global fp_count
+    row = fp_rows.get(gid)
+    if row is None:
+        if fp_count < FP_CAPACITY:
+            row = fp_count; fp_count += 1
+        else:
+            row = int(fp_last_seen.argmin())
+            del fp_rows[int(fp_ids[row])]
+        fp_rows[gid] = row
+        fp_ids[row] = gid
+    fp_last_seen[row] = frame_idx
+    return row
 
-def identify_patient(image_crop):
+def set_fingerprint(gid, vector):
+    row = fingerprint_row(gid)
+    fp_raw[row] = vector
+    fp_matrix[row] = vector / (np.linalg.norm(vector) + 1e-12)
+
+def update_fingerprint(gid, new_vec):
+    """Adaptive update: 90% old, 10% new (restarts from new_vec if gid was evicted)"""
+    if gid not in fp_rows:
+        set_fingerprint(gid, new_vec); return
+    row = fingerprint_row(gid)
+    raw = fp_raw[row]  # view: updated in place, no temporaries
+    raw -= new_vec; raw *= 0.9; raw += new_vec  # = 0.9 * old + 0.1 * new
+    np.divide(raw, np.linalg.norm(raw) + 1e-12, out=fp_matrix[row])
+
+def identify_patient(curr_vector):
     global next_global_id
-    curr_vector = get_embedding(image_crop)
-    best_id, lowest_dist = None, 1.0 
-    
-    for pid, saved_vector in patient_fingerprints.items():
-        dist = cosine(curr_vector, saved_vector)
-        if dist < lowest_dist: lowest_dist = dist; best_id = pid
-            
-    if lowest_dist < MATCH_THRESHOLD:
-        return best_id, True, curr_vector
-    else:
-        new_id = next_global_id; next_global_id += 1
-        return new_id, False, curr_vector
+    if fp_count:
+        # Cosine distance to every fingerprint in one GEMV
+        curr = curr_vector / (np.linalg.norm(curr_vector) + 1e-12)
+        dists = 1.0 - fp_matrix[:fp_count] @ curr
+        best = int(dists.argmin())
+        if dists[best] < MATCH_THRESHOLD:
+            return int(fp_ids[best]), True, curr_vector
+
+    new_id = next_global_id; next_global_id += 1
+    return new_id, False, curr_vector
+
+# Local preview windows only with CIC_SHOW=1 (no GUI paint or waitKey tick
+# otherwise; the Flask dashboard is the display). Headless: stop with Ctrl+C
+SHOW_LOCAL = os.environ.get("CIC_SHOW", "0") == "1"
 
 # --- 3. MAIN LOOP ---
 cap = cv2.VideoCapture(0)
+cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))  # camera sends MJPEG, not raw YUY2
 cap.set(3, 1920); cap.set(4, 1080)
 
-while True:
-    ret, frame = cap.read()
-    if not ret: break
-    frame = cv2.flip(frame, 1) # Mirror Feed
-    
-    display_map = map_img.copy()
-    cv2.rectangle(display_map, (0,0), (MAP_WIDTH, MAP_HEIGHT), (255, 255, 255), -1)
-    cv2.polylines(frame, [np.int32(src_points)], True, (0, 255, 255), 2)
+# Pipeline: capture thread -> detection thread -> this loop (Re-ID, map, display).
+# Bounded queues drop the oldest item so latency stays at most ~2 frames.
+detect_queue = queue.Queue(maxsize=1)  # freshest frame only
+reid_queue = queue.Queue(maxsize=2)    # (frame, results); None = camera ended
+stop_event = threading.Event()
 
-    results = yolo_model.track(frame, persist=True, classes=[0], verbose=False)
+def put_latest(q, item):
+    """Non-blocking put; drops the oldest queued item when full"""
+    try:
+        q.put_nowait(item)
+    except queue.Full:
+        try: q.get_nowait()
+        except queue.Empty: pass
+        q.put_nowait(item)
+
+def capture_loop():
+    # grab() keeps the driver buffer drained so frames never go stale; the
+    # decode (retrieve) only runs once detection has taken the previous frame
+    while not stop_event.is_set():
+        if not cap.grab():
+            put_latest(detect_queue, None); break
+        if detect_queue.empty():
+            ret, frame = cap.retrieve()
+            if ret:
+                put_latest(detect_queue, frame)
+
+def detect_loop():
+    while not stop_event.is_set():
+        frame = detect_queue.get()
+        if frame is None:
+            put_latest(reid_queue, None); break
+        results = yolo_model.track(frame, persist=True, classes=[0], imgsz=640, half=YOLO_HALF,
+                                   device=device, verbose=False)
+        put_latest(reid_queue, (frame, results))
+
+capture_thread = threading.Thread(target=capture_loop, daemon=True)
+detect_thread = threading.Thread(target=detect_loop, daemon=True)
+capture_thread.start()
+detect_thread.start()
+
+display_map = np.empty((MAP_HEIGHT, MAP_WIDTH, 3), dtype=np.uint8)  # reused every frame
+
+# try/finally: headless runs stop with Ctrl+C, which must still release the camera
+try:
+    while True:
+        item = reid_queue.get()
+        if item is None: break
+        frame, results = item
+        frame_idx += 1
+        if frame.shape[1] != FRAME_W or frame.shape[0] != FRAME_H:
+            FRAME_H, FRAME_W = frame.shape[:2]
+            PERSP_LUT, SRC_POINTS_I32 = build_frame_geometry(FRAME_W, FRAME_H)
+        frame_labels = []  # (text, x2, y1, color): drawn on the mirrored preview
+    
+        display_map.fill(255)  # white map
+        cv2.polylines(frame, [SRC_POINTS_I32], True, (0, 255, 255), 2)
     
-    # Reset live data for this frame (so people who leave disappear from app)
-    current_frame_data = {}
+        # Reset live data for this frame (so people who leave disappear from app)
+        current_frame_data = {}
 
-    if results[0].boxes.id is not None:
-        boxes = results[0].boxes.xyxy.cpu().numpy()
-        track_ids = results[0].boxes.id.int().cpu().numpy()
+        if results[0].boxes.id is not None:
+            boxes = results[0].boxes.xyxy.cpu().numpy()
+            track_ids = results[0].boxes.id.int().cpu().numpy()
 
-        for box, track_id in zip(boxes, track_ids):
-            x1, y1, x2, y2 = map(int, box)
-            
-            # Re-ID Logic
+            # Re-ID: crop everyone first, then embed all crops in one batch
             h, w, _ = frame.shape
-            face_crop = frame[max(0,y1):min(h,y2), max(0,x1):min(w,x2)]
+            crops, valid, seen_boxes = [], [], {}
+            for i, (box, track_id) in enumerate(zip(boxes, track_ids)):
+                x1, y1, x2, y2 = map(int, box)
+                crops.append(frame[max(0,y1):min(h,y2), max(0,x1):min(w,x2)])
+
+                # Mapped track whose box hasn't left its 8px grid cell: keep the last embedding
+                box_q = (x1 >> 3, y1 >> 3, x2 >> 3, y2 >> 3)
+                if track_id in active_track_map and embedded_boxes.get(track_id) == box_q:
+                    seen_boxes[track_id] = box_q
+                elif crops[i].size > 0:
+                    seen_boxes[track_id] = box_q
+                    valid.append(i)
+            embedded_boxes = seen_boxes  # drops tracks that left the frame
+            embeddings = dict(zip(valid, get_embeddings([crops[i] for i in valid]))) if valid else {}
+
+            for i, (box, track_id) in enumerate(zip(boxes, track_ids)):
+                x1, y1, x2, y2 = map(int, box)
             
-            if face_crop.size > 0:
-                if track_id not in active_track_map:
-                    global_id, _, vector = identify_patient(face_crop)
-                    active_track_map[track_id] = global_id
-                    patient_fingerprints[global_id] = vector
+                new_vec = embeddings.get(i)
+                if new_vec is not None:
+                    if track_id not in active_track_map:
+                        global_id, _, vector = identify_patient(new_vec)
+                        active_track_map[track_id] = global_id
+                        if len(active_track_map) > TRACK_MAP_CAPACITY:
+                            active_track_map.popitem(last=False)  # forget the stalest tracker id
+                        set_fingerprint(global_id, vector)
                 
-                # Update Embedding (Adaptive)
-                gid = active_track_map[track_id]
-                new_vec = get_embedding(face_crop)
-                patient_fingerprints[gid] = (0.9 * patient_fingerprints[gid]) + (0.1 * new_vec)
-
-            # Map Logic
-            gid = active_track_map.get(track_id, 1)
-            foot_x, foot_y = int((x1 + x2) / 2), int(y2)
-            p = np.array([[[foot_x, foot_y]]], dtype=np.float32)
-            transformed = cv2.perspectiveTransform(p, matrix)
-            map_x, map_y = int(transformed[0][0][0]), int(transformed[0][0][1])
-
-            # --- DATA SYNC TO WEB APP ---
-            # Link Global ID to EPR Record (Modulo to loop through dummy data)
-            # Patient 1 -> EPR[0], Patient 2 -> EPR[1]
-            epr_index = (gid - 1) % len(epr_database)
-            epr_record = epr_database[epr_index]
-            
-            # Package the data for the app
-            current_frame_data[gid] = {
-                "name": epr_record['name'],
-                "epr_id": epr_record['epr_id'],
-                "condition": epr_record['condition'],
-                "triage_score": epr_record['triage_score'],
-                "map_x": map_x,
-                "map_y": map_y
-            }
-
-            # Draw on Screens
-            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-            cv2.putText(frame, f"{epr_record['name']}", (x1, y1 - 10), 
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
-            
-            if 0 <= map_x < MAP_WIDTH and 0 <= map_y < MAP_HEIGHT:
-                cv2.circle(display_map, (map_x, map_y), 15, (255, 0, 0), -1)
-                cv2.putText(display_map, f"{epr_record['name']}", (map_x+20, map_y), 
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 0), 2)
+                    # Update Embedding (Adaptive)
+                    gid = active_track_map[track_id]
+                    update_fingerprint(gid, new_vec)
+                elif track_id in active_track_map and active_track_map[track_id] in fp_rows:
+                    fp_last_seen[fp_rows[active_track_map[track_id]]] = frame_idx  # still in view
 
-    # Update the global variable for Flask
-    live_patient_data = current_frame_data
+                # Map Logic
+                gid = active_track_map.get(track_id, 1)
+                if track_id in active_track_map:
+                    active_track_map.move_to_end(track_id)
+                foot_x = min(max(int((x1 + x2) / 2), 0), FRAME_W - 1)
+                foot_y = min(max(int(y2), 0), FRAME_H - 1)
+                map_x, map_y = map(int, PERSP_LUT[foot_y, foot_x])
 
-    cv2.imshow("Main System", frame)
-    cv2.imshow("2D Map", display_map)
+                # --- DATA SYNC TO WEB APP ---
+                # Link Global ID to EPR Record (Modulo to loop through dummy data)
+                # Patient 1 -> EPR[0], Patient 2 -> EPR[1]
+                epr_index = (gid - 1) % len(epr_database)
+                epr_record = epr_database[epr_index]
+            
+                # Package the data for the app
+                current_frame_data[gid] = (epr_index, map_x, map_y)
+
+                # Draw on Screens
+                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+                frame_labels.append((epr_record['name'], x2, y1, (0, 255, 0)))
+            
+                if 0 <= map_x < MAP_WIDTH and 0 <= map_y < MAP_HEIGHT:
+                    cv2.circle(display_map, (map_x, map_y), 15, (255, 0, 0), -1)
+                    cv2.putText(display_map, f"{epr_record['name']}", (map_x+20, map_y), 
+                                cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 0), 2)
 
-    if cv2.waitKey(1) & 0xFF == ord('q'): break
+        # Update the global variable for Flask
+        live_patient_data = current_frame_data
 
-cap.release()
-cv2.destroyAllWindows()
\ No newline at end of file
+        if SHOW_LOCAL:
+            # Preview stays mirrored like before; labels go on after the flip so they read correctly
+            preview = cv2.flip(frame, 1)
+            for text, x2, y1, color in frame_labels:
+                cv2.putText(preview, text, (FRAME_W - 1 - x2, y1 - 10),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2)
+            cv2.imshow("Main System", preview)
+            cv2.imshow("2D Map", display_map)
+            if cv2.waitKey(1) & 0xFF == ord('q'): break
+finally:
+    stop_event.set()
+    capture_thread.join(timeout=1)  # don't release the camera mid-read
+    cap.release()
+    if SHOW_LOCAL:
+        cv2.destroyAllWindows()
\ No newline at end of file
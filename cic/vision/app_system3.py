@@ -2,26 +2,32 @@ import cv2
 import numpy as np
 from ultralytics import YOLO
 import torch
-import torchvision.transforms as T
 import torchvision.models as models
-from scipy.spatial.distance import cosine
+from torchvision.models import quantization as qmodels
 import json
 import threading
+import queue
 from flask import Flask, render_template, jsonify, Response
 import time
+import os
 
 # --- 1. SETUP FLASK SERVER ---
 app = Flask(__name__)
 
 # Global variables
 live_patient_data = {} 
-output_map_frame = None 
-data_lock = threading.Lock() 
+output_map_part = None  # latest map, already encoded as a multipart chunk
+output_map_version = 0            # bumped each time the render thread publishes a map
+map_cond = threading.Condition()  # notified on publish
 
 # Load dummy records
 with open('cic/vision/patients.json', 'r') as f:
     epr_database = json.load(f)
 
+# Triage dot colour (BGR) per record, looked up once instead of per detection
+TRIAGE_COLORS = {"Red": (0, 0, 255), "Yellow": (0, 255, 255), "Green": (0, 200, 0)}  # else Blue
+DOT_COLORS = [TRIAGE_COLORS.get(r['triage_score'].split()[0], (255, 0, 0)) for r in epr_database]
+
 @app.route('/')
 def index():
     return render_template('index3.html')
@@ -30,17 +36,30 @@ def index():
 def get_data():
     return jsonify(live_patient_data)
 
+# Multipart part header/trailer, built once
+MJPEG_HEADER = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n'
+MJPEG_TRAILER = b'\r\n'
+MAP_JPEG_PARAMS = [cv2.IMWRITE_JPEG_QUALITY, 80, cv2.IMWRITE_JPEG_OPTIMIZE, 0]  # no Huffman optimisation pass
+
+# Map stream pacing: sleep only what is left of each frame's budget
+MAP_FEED_PERIOD = 1.0 / 30
+
 def generate_map_feed():
-    global output_map_frame
+    # The render thread encodes each map once; every client just sends the same bytes
+    last_version = 0
+    next_deadline = time.monotonic()
     while True:
-        with data_lock:
-            if output_map_frame is None:
-                continue
-            (flag, encodedImage) = cv2.imencode(".jpg", output_map_frame)
-            if not flag:
-                continue
-        yield(b'--frame\r\n' b'Content-Type: image/jpeg\r\n\r\n' + 
-              bytearray(encodedImage) + b'\r\n')
+        # Sleep outside the lock so the vision loop can publish new frames
+        delay = next_deadline - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        next_deadline = max(next_deadline + MAP_FEED_PERIOD, time.monotonic())
+
+        # Block until a map newer than the last one sent is published
+        with map_cond:
+            map_cond.wait_for(lambda: output_map_version != last_version and output_map_part is not None)
+            part, last_version = output_map_part, output_map_version
+        yield part
 
 @app.route('/map_feed')
 def map_feed():
@@ -55,25 +74,61 @@ flask_thread.daemon = True
 flask_thread.start()
 
 # --- 2. SETUP AI ---
-device = torch.device("mps") if torch.backends.mps.is_available() else torch.device("cpu")
+if torch.cuda.is_available():
+    device = torch.device("cuda")
+elif torch.backends.mps.is_available():
+    device = torch.device("mps")
+else:
+    device = torch.device("cpu")
 print(f"--- SYSTEM ONLINE ---")
 print(f"Mobile Dashboard: http://localhost:5001")
 
-feature_extractor = models.resnet18(weights=models.ResNet18_Weights.IMAGENET1K_V1)
-feature_extractor = torch.nn.Sequential(*(list(feature_extractor.children())[:-1]))
-feature_extractor.to(device)
-feature_extractor.eval()
-
-preprocess = T.Compose([
-    T.ToPILImage(), T.Resize((224, 224)), T.ToTensor(),
-    T.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
-])
-
-yolo_model = YOLO('yolov8n.pt') 
+# FP16 + traced graph on the accelerator; on CPU, INT8 (FBGEMM kernels) when available.
+# Batch size stays dynamic
+USE_INT8_CPU = True
+cpu_int8 = USE_INT8_CPU and device.type == "cpu" and "fbgemm" in torch.backends.quantized.supported_engines
+model_dtype = torch.float32 if device.type == "cpu" else torch.float16
+if cpu_int8:
+    # torchvision's pre-quantized ResNet18 (same ImageNet weights); quant/dequant wrap the backbone
+    torch.backends.quantized.engine = "fbgemm"
+    q = qmodels.resnet18(weights=qmodels.ResNet18_QuantizedWeights.IMAGENET1K_FBGEMM_V1, quantize=True)
+    feature_extractor = torch.nn.Sequential(q.quant, q.conv1, q.bn1, q.relu, q.maxpool,
+                                            q.layer1, q.layer2, q.layer3, q.layer4, q.avgpool, q.dequant).eval()
+else:
+    feature_extractor = models.resnet18(weights=models.ResNet18_Weights.IMAGENET1K_V1)
+    feature_extractor = torch.nn.Sequential(*(list(feature_extractor.children())[:-1]))
+    feature_extractor = feature_extractor.to(device, dtype=model_dtype).eval()
+with torch.no_grad():
+    feature_extractor = torch.jit.trace(feature_extractor, torch.zeros(1, 3, 224, 224, device=device, dtype=model_dtype))
+
+# Fused preprocessing: cv2.resize on the uint8 crops, one upload, then
+# BGR->RGB + scale + normalize on the device (no PIL, no per-crop tensors)
+MEAN = torch.tensor([0.485, 0.456, 0.406], device=device).view(1, 3, 1, 1)
+STD = torch.tensor([0.229, 0.224, 0.225], device=device).view(1, 3, 1, 1)
+
+def gpu_preprocess(image_crops):
+    arr = np.stack([cv2.resize(c, (224, 224), interpolation=cv2.INTER_AREA) for c in image_crops])
+    t = torch.from_numpy(arr).to(device, non_blocking=True)
+    t = t.permute(0, 3, 1, 2)[:, [2, 1, 0]].float().mul_(1 / 255.)
+    return t.sub_(MEAN).div_(STD).to(model_dtype)
+
+# Detector: prebuilt FP16 export for the accelerator if present (same API), else .pt
+#   TensorRT: YOLO('yolov8n.pt').export(format='engine', half=True, imgsz=640)
+#   CoreML:   YOLO('yolov8n.pt').export(format='coreml', half=True, imgsz=640)
+if device.type == "cuda" and os.path.exists('yolov8n.engine'):
+    yolo_model = YOLO('yolov8n.engine', task='detect')
+elif device.type == "mps" and os.path.exists('yolov8n.mlpackage'):
+    yolo_model = YOLO('yolov8n.mlpackage', task='detect')
+else:
+    yolo_model = YOLO('yolov8n.pt')
+
+# YOLO sees a half-resolution copy of the frame; boxes are scaled back to capture
+# pixels on the device, so calibration, crops and drawing stay full resolution
+INFER_SCALE = 0.5
 
 # Map Settings
 MAP_WIDTH, MAP_HEIGHT = 500, 500
-map_img = np.zeros((MAP_HEIGHT, MAP_WIDTH, 3), dtype=np.uint8)
+BLANK_MAP = np.full((MAP_HEIGHT, MAP_WIDTH, 3), 255, dtype=np.uint8)  # white floor
 
 # CALIBRATION
 src_points = np.float32([
@@ -82,6 +137,9 @@ src_points = np.float32([
     [1664, 1072],  # Bottom-Right
     [216, 1068]   # Bottom-Left
 ])
+
+# Calibration outline as int32 for polylines, drawn every frame
+SRC_POINTS_I32 = np.int32(src_points)
 dst_points = np.float32([
     [0, MAP_HEIGHT], [MAP_WIDTH, MAP_HEIGHT],
     [MAP_WIDTH, 0], [0, 0]
@@ -93,19 +151,54 @@ next_global_id = 1
 MATCH_THRESHOLD = 0.20 
 active_track_map = {} 
 
+# Mapped tracks only get a fresh embedding every REID_UPDATE_INTERVAL frames (~0.5 s)
+REID_UPDATE_INTERVAL = 15
+last_update_frame = {}  # gid -> frame_idx of its last EMA update
+frame_idx = 0
+
+# Maintained alongside patient_fingerprints: L2-normalized rows, one per global id
+fingerprint_ids, fingerprint_rows = [], {}  # row order; gid -> row
+# Preallocated; capacity doubles when full, so adding a patient is amortized O(D)
+fingerprint_matrix = np.empty((16, 512), dtype=np.float32)
+
+def set_fingerprint(gid, vector):
+    global fingerprint_matrix
+    patient_fingerprints[gid] = np.array(vector, dtype=np.float32)  # own copy, EMA'd in place
+    row = vector / (np.linalg.norm(vector) + 1e-9)
+    if gid in fingerprint_rows:
+        fingerprint_matrix[fingerprint_rows[gid]] = row
+    else:
+        n = len(fingerprint_ids)
+        if n == len(fingerprint_matrix):
+            fingerprint_matrix = np.concatenate([fingerprint_matrix, np.empty_like(fingerprint_matrix)])
+        fingerprint_rows[gid] = n; fingerprint_ids.append(gid)
+        fingerprint_matrix[n] = row
+
+def update_fingerprint(gid, new_vec):
+    """Adaptive update in place: 90% old, 10% new, then renormalize the gallery row"""
+    raw = patient_fingerprints[gid]
+    raw -= new_vec; raw *= 0.9; raw += new_vec  # = 0.9 * old + 0.1 * new, no temporaries
+    np.divide(raw, np.linalg.norm(raw) + 1e-9, out=fingerprint_matrix[fingerprint_rows[gid]])
+
+def get_embeddings_batch(image_crops):
+    """One forward pass for every crop in the frame -> (N, 512)"""
+    batch = gpu_preprocess(image_crops)
+    with torch.no_grad(): features = feature_extractor(batch)
+    return features.flatten(1).float().cpu().numpy()
+
 def get_embedding(image_crop):
-    img_tensor = preprocess(image_crop).unsqueeze(0).to(device)
-    with torch.no_grad(): features = feature_extractor(img_tensor)
-    return features.cpu().numpy().flatten()
+    return get_embeddings_batch([image_crop])[0]
 
-def identify_patient(image_crop):
+def identify_patient(curr_vector):
     global next_global_id
-    curr_vector = get_embedding(image_crop)
     best_id, lowest_dist = None, 1.0 
     
-    for pid, saved_vector in patient_fingerprints.items():
-        dist = cosine(curr_vector, saved_vector)
-        if dist < lowest_dist: lowest_dist = dist; best_id = pid
+    if fingerprint_ids:
+        # Cosine distance to every patient in one GEMV
+        curr = curr_vector / (np.linalg.norm(curr_vector) + 1e-9)
+        dists = 1.0 - fingerprint_matrix[:len(fingerprint_ids)] @ curr
+        best = int(np.argmin(dists))
+        if dists[best] < lowest_dist: lowest_dist = dists[best]; best_id = fingerprint_ids[best]
             
     if lowest_dist < MATCH_THRESHOLD:
         return best_id, True, curr_vector
@@ -113,11 +206,10 @@ def identify_patient(image_crop):
         new_id = next_global_id; next_global_id += 1
         return new_id, False, curr_vector
 
-def get_checkup_info(news2_score, patient_id):
+def checkup_rule(news2_score):
     """
-    Calculates the frequency and a dummy 'time remaining' based on NEWS2.
+    Check-up frequency (minutes) and risk label for a NEWS2 score.
     """
-    # 1. Determine Frequency Rule (in minutes)
     if news2_score >= 7:
         freq_mins = 30         # High Risk: 30 mins
         risk_label = "HIGH RISK"
@@ -130,8 +222,18 @@ def get_checkup_info(news2_score, patient_id):
     else:
         freq_mins = 720        # Low Risk: 12 hours
         risk_label = "LOW RISK"
+    return freq_mins, risk_label
+
+# Frequency rule per EPR record, computed once at load
+CHECKUP_RULES = [checkup_rule(r['news2_score']) for r in epr_database]
+
+def get_checkup_info(epr_index, patient_id):
+    """
+    Risk label and a dummy 'time remaining' from the record's NEWS2 rule.
+    """
+    freq_mins, risk_label = CHECKUP_RULES[epr_index]
 
-    # 2. Simulate "Time Remaining" for the demo
+    # Simulate "Time Remaining" for the demo
     # We use the patient_id to make a fixed "random" offset so it looks consistent
     # e.g., Patient 1 always has 15 mins left, Patient 2 has 45 mins left.
     offset = (patient_id * 17) % freq_mins 
@@ -139,102 +241,183 @@ def get_checkup_info(news2_score, patient_id):
     
     return risk_label, mins_remaining
 
+# Local preview windows only with CIC_SHOW=1 (no GUI paint or waitKey tick
+# otherwise; the Flask dashboard is the display). Headless: stop with Ctrl+C
+SHOW_LOCAL = os.environ.get("CIC_SHOW", "0") == "1"
+
 # --- 3. MAIN LOOP ---
 # UPDATE: Change 'demo_footage.mp4' back to 0 if using webcam
 cap = cv2.VideoCapture(0) 
 
-while True:
-    ret, frame = cap.read()
-    
-    if not ret: 
-        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-        continue
+# Pipeline: capture thread -> this loop (YOLO, Re-ID, drawing) -> render thread (JPEG).
+# Bounded queues drop the oldest item so latency stays at most ~2 frames.
+frame_q = queue.Queue(maxsize=1)   # freshest captured frame only
+render_q = queue.Queue(maxsize=2)  # finished maps to encode; None = stop
+stop_event = threading.Event()
+
+def put_latest(q, item):
+    """Non-blocking put; drops the oldest queued item when full and returns it"""
+    dropped = None
+    try:
+        q.put_nowait(item)
+    except queue.Full:
+        try: dropped = q.get_nowait()
+        except queue.Empty: pass
+        q.put_nowait(item)
+    return dropped
+
+def capture_loop():
+    # grab() keeps the driver buffer drained so frames never go stale; the
+    # decode (retrieve) only runs once the main loop has taken the previous frame
+    while not stop_event.is_set():
+        if not cap.grab():
+            cap.set(cv2.CAP_PROP_POS_FRAMES, 0) # Loop video
+            continue
+        if frame_q.empty():
+            ret, frame = cap.retrieve()
+            if ret:
+                put_latest(frame_q, frame)
+
+def render_loop():
+    # Encode once per frame here, off the inference thread and out of the HTTP generator
+    global output_map_part, output_map_version
+    while True:
+        current_map = render_q.get()
+        if current_map is None: break
+        (flag, encodedImage) = cv2.imencode(".jpg", current_map, MAP_JPEG_PARAMS)
+        free_maps.put(current_map)  # encoded: the main loop may draw into it again
+        if not flag:
+            continue
+        # Single copy: join reads the encoder's buffer directly (no bytearray temp)
+        part = b''.join((MJPEG_HEADER, memoryview(encodedImage), MJPEG_TRAILER))
+        with map_cond:
+            output_map_part = part
+            output_map_version += 1
+            map_cond.notify_all()
+
+capture_thread = threading.Thread(target=capture_loop, daemon=True)
+render_thread = threading.Thread(target=render_loop, daemon=True)
+capture_thread.start()
+render_thread.start()
+
+# Map canvases are recycled through a free list: the render thread hands each
+# one back after encoding it, and maps dropped from render_q go straight back.
+# maxsize queued + 1 encoding + 1 drawing, so get() never waits.
+free_maps = queue.Queue()
+for _ in range(render_q.maxsize + 2):
+    free_maps.put(np.empty_like(BLANK_MAP))
+
+# try/finally: headless runs stop with Ctrl+C, which must still release the camera
+try:
+    while True:
+        frame = frame_q.get()
+        frame_idx += 1
 
-    # frame = cv2.resize(frame, (1920, 1080)) # Enable if video is 4K
-    frame = cv2.flip(frame, 1) # Mirroring
+        # frame = cv2.resize(frame, (1920, 1080)) # Enable if video is 4K
+        frame = cv2.flip(frame, 1) # Mirroring
+        small = cv2.resize(frame, None, fx=INFER_SCALE, fy=INFER_SCALE, interpolation=cv2.INTER_AREA)
     
-    current_map = map_img.copy()
-    cv2.rectangle(current_map, (0,0), (MAP_WIDTH, MAP_HEIGHT), (255, 255, 255), -1)
-    cv2.polylines(frame, [np.int32(src_points)], True, (0, 255, 255), 2)
+        current_map = free_maps.get()
+        np.copyto(current_map, BLANK_MAP)
+        cv2.polylines(frame, [SRC_POINTS_I32], True, (0, 255, 255), 2)
 
-    results = yolo_model.track(frame, persist=True, classes=[0], verbose=False)
-    current_frame_data = {}
+        results = yolo_model.track(small, persist=True, classes=[0], verbose=False)
+        current_frame_data = {}
 
-    if results[0].boxes.id is not None:
-        boxes = results[0].boxes.xyxy.cpu().numpy()
-        track_ids = results[0].boxes.id.int().cpu().numpy()
+        if results[0].boxes.id is not None:
+            # Boxes + ids in one device->host transfer (one sync instead of two)
+            det = results[0].boxes
+            det = torch.cat([det.xyxy / INFER_SCALE, det.id.view(-1, 1).to(det.xyxy.dtype)], dim=1).cpu().numpy().astype(np.int32)
+            boxes, track_ids = det[:, :4], det[:, 4]
 
-        for box, track_id in zip(boxes, track_ids):
-            x1, y1, x2, y2 = map(int, box)
-            
+            # Map Math for every foot point at once (one perspectiveTransform per frame)
+            foot = np.stack([(boxes[:, 0] + boxes[:, 2]) // 2, boxes[:, 3]], axis=1).astype(np.float32)
+            mapped = cv2.perspectiveTransform(foot.reshape(-1, 1, 2), matrix).reshape(-1, 2).astype(np.int32).tolist()
+
+            # Crop bounds clamped for every box at once; .tolist() yields plain ints
             h, w, _ = frame.shape
-            face_crop = frame[max(0,y1):min(h,y2), max(0,x1):min(w,x2)]
-            
-            if face_crop.size > 0:
-                if track_id not in active_track_map:
-                    global_id, _, vector = identify_patient(face_crop)
-                    active_track_map[track_id] = global_id
-                    patient_fingerprints[global_id] = vector
+            crop_boxes = np.empty_like(boxes)
+            np.clip(boxes[:, 0::2], 0, w, out=crop_boxes[:, 0::2])
+            np.clip(boxes[:, 1::2], 0, h, out=crop_boxes[:, 1::2])
+            box_list, crop_list, id_list = boxes.tolist(), crop_boxes.tolist(), track_ids.tolist()
+
+            # Re-ID: gather every valid crop, then one batched forward pass
+            crops, crop_idx = [], []
+            for i, (track_id, (cx1, cy1, cx2, cy2)) in enumerate(zip(id_list, crop_list)):
+                gid = active_track_map.get(track_id)
+                if gid is not None and frame_idx - last_update_frame.get(gid, -REID_UPDATE_INTERVAL) < REID_UPDATE_INTERVAL:
+                    continue  # appearance changes slowly: skip the ResNet pass for this track
+                face_crop = frame[cy1:cy2, cx1:cx2]
+                if face_crop.size > 0:
+                    crops.append(face_crop); crop_idx.append(i)
+            vectors = dict(zip(crop_idx, get_embeddings_batch(crops))) if crops else {}
+
+            for i, (track_id, (x1, y1, x2, y2)) in enumerate(zip(id_list, box_list)):
+                new_vec = vectors.get(i)
+                if new_vec is not None:
+                    if track_id not in active_track_map:
+                        global_id, _, vector = identify_patient(new_vec)
+                        active_track_map[track_id] = global_id
+                        set_fingerprint(global_id, vector)
                 
-                gid = active_track_map[track_id]
-                new_vec = get_embedding(face_crop)
-                patient_fingerprints[gid] = (0.9 * patient_fingerprints[gid]) + (0.1 * new_vec)
+                    # Same vector feeds the adaptive update (no second forward pass)
+                    gid = active_track_map[track_id]
+                    update_fingerprint(gid, new_vec)
+                    last_update_frame[gid] = frame_idx
 
-            gid = active_track_map.get(track_id, 1)
+                gid = active_track_map.get(track_id, 1)
             
-            # Get EPR Data
-            epr_index = (gid - 1) % len(epr_database)
-            epr_record = epr_database[epr_index]
+                # Get EPR Data
+                epr_index = (gid - 1) % len(epr_database)
+                epr_record = epr_database[epr_index]
             
-            # --- CALCULATE NEWS2 DATA ---
-            risk_label, mins_left = get_checkup_info(epr_record['news2_score'], gid)
-            # ----------------------------
-
-            # Map Math
-            foot_x, foot_y = int((x1 + x2) / 2), int(y2)
-            p = np.array([[[foot_x, foot_y]]], dtype=np.float32)
-            transformed = cv2.perspectiveTransform(p, matrix)
-            map_x, map_y = int(transformed[0][0][0]), int(transformed[0][0][1])
-
-            # Color Logic
-            triage_text = epr_record['triage_score'].split()[0]
-            dot_color = (255, 0, 0)
-            if triage_text == "Red": dot_color = (0, 0, 255)
-            elif triage_text == "Yellow": dot_color = (0, 255, 255)
-            elif triage_text == "Green": dot_color = (0, 200, 0)
-
-            # Package Data
-            current_frame_data[gid] = {
-                "name": epr_record['name'],
-                "epr_id": epr_record['epr_id'],
-                "condition": epr_record['condition'],
-                "triage_score": epr_record['triage_score'],
-                "news2_score": epr_record['news2_score'], # Needed for sorting
-                "risk_label": risk_label,                 # Needed for timer
-                "mins_remaining": mins_left,              # Needed for timer
-                "map_x": map_x,
-                "map_y": map_y
-            }
-
-            # Draw on Camera
-            cv2.rectangle(frame, (x1, y1), (x2, y2), dot_color, 2)
-            cv2.putText(frame, f"{epr_record['name']} ({risk_label})", (x1, y1 - 10), 
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, dot_color, 2)
+                # --- CALCULATE NEWS2 DATA ---
+                risk_label, mins_left = get_checkup_info(epr_index, gid)
+                # ----------------------------
+
+                # Map Math
+                map_x, map_y = mapped[i]
+
+                # Color Logic
+                dot_color = DOT_COLORS[epr_index]
+
+                # Package Data
+                current_frame_data[gid] = {
+                    "name": epr_record['name'],
+                    "epr_id": epr_record['epr_id'],
+                    "condition": epr_record['condition'],
+                    "triage_score": epr_record['triage_score'],
+                    "news2_score": epr_record['news2_score'], # Needed for sorting
+                    "risk_label": risk_label,                 # Needed for timer
+                    "mins_remaining": mins_left,              # Needed for timer
+                    "map_x": map_x,
+                    "map_y": map_y
+                }
+
+                # Draw on Camera
+                cv2.rectangle(frame, (x1, y1), (x2, y2), dot_color, 2)
+                cv2.putText(frame, f"{epr_record['name']} ({risk_label})", (x1, y1 - 10), 
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, dot_color, 2)
             
-            # Draw on Map
-            if 0 <= map_x < MAP_WIDTH and 0 <= map_y < MAP_HEIGHT:
-                cv2.circle(current_map, (map_x, map_y), 15, dot_color, -1)
-                cv2.putText(current_map, f"{epr_record['name']}", (map_x+20, map_y), 
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 0), 2)
-
-    live_patient_data = current_frame_data
-    with data_lock:
-        output_map_frame = current_map.copy()
-
-    cv2.imshow("Main System", frame)
-    cv2.imshow("2D Map", current_map) 
-
-    if cv2.waitKey(1) & 0xFF == ord('q'): break
-
-cap.release()
-cv2.destroyAllWindows()
\ No newline at end of file
+                # Draw on Map
+                if 0 <= map_x < MAP_WIDTH and 0 <= map_y < MAP_HEIGHT:
+                    cv2.circle(current_map, (map_x, map_y), 15, dot_color, -1)
+                    cv2.putText(current_map, f"{epr_record['name']}", (map_x+20, map_y), 
+                                cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 0), 2)
+
+        live_patient_data = current_frame_data
+        dropped_map = put_latest(render_q, current_map)  # no copy: only free buffers are drawn into
+        if dropped_map is not None:
+            free_maps.put(dropped_map)
+
+        if SHOW_LOCAL:
+            cv2.imshow("Main System", frame)
+            cv2.imshow("2D Map", current_map)
+            if cv2.waitKey(1) & 0xFF == ord('q'): break
+finally:
+    stop_event.set()
+    put_latest(render_q, None)
+    capture_thread.join(timeout=1)  # don't release the camera mid-read
+    cap.release()
+    if SHOW_LOCAL:
+        cv2.destroyAllWindows()
\ No newline at end of file
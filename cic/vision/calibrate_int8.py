@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+INT8 Calibration
+================
+Captures calibration frames from the ward camera and exports an INT8
+TensorRT engine of the YOLO detector (needs a CUDA GPU + TensorRT).
+
+Run: python cic/vision/calibrate_int8.py [num_frames]
+Press 'q' to stop capturing early.
+
+INT8 accuracy depends on the calibration images looking like the real
+feed, so capture during normal ward activity (people in frame).
+"""
+
+import os
+import sys
+import shutil
+import cv2
+
+# Add parent to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+try:
+    from cic import config
+except ImportError:
+    import config
+
+CALIB_DIR = "int8_calib"
+CALIB_YAML = os.path.join(CALIB_DIR, "calib.yaml")
+CAPTURE_EVERY_N = 5          # skip near-duplicate consecutive frames
+
+
+def capture_frames(num_frames: int = 500) -> int:
+    """Save num_frames camera frames to CALIB_DIR/images. Returns count saved."""
+    image_dir = os.path.join(CALIB_DIR, "images")
+    os.makedirs(image_dir, exist_ok=True)
+
+    cap = cv2.VideoCapture(config.CAMERA_INDEX)
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, config.FRAME_WIDTH)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, config.FRAME_HEIGHT)
+
+    if not cap.isOpened():
+        print("ERROR: Could not open camera!")
+        return 0
+
+    saved = 0
+    frame_idx = 0
+    while saved < num_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+
+        if frame_idx % CAPTURE_EVERY_N == 0:
+            cv2.imwrite(os.path.join(image_dir, f"{saved:04d}.jpg"), frame)
+            saved += 1
+        frame_idx += 1
+
+        cv2.putText(frame, f"Calibration frames: {saved}/{num_frames}", (10, 30),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
+        cv2.imshow("INT8 Calibration", frame)
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            break
+
+    cap.release()
+    cv2.destroyAllWindows()
+    return saved
+
+
+def write_dataset_yaml():
+    """Write the minimal dataset YAML ultralytics needs for calibration."""
+    with open(CALIB_YAML, "w") as f:
+        f.write(f"path: {os.path.abspath(CALIB_DIR)}\n")
+        f.write("train: images\n")
+        f.write("val: images\n")
+        f.write("names:\n")
+        f.write("  0: person\n")
+
+
+def export_int8() -> str:
+    """Export YOLO_MODEL to an INT8 engine at YOLO_MODEL_INT8."""
+    from ultralytics import YOLO
+
+    # Ultralytics names every engine <model>.engine; keep the FP16 one intact
+    fp16_backup = None
+    if os.path.exists(config.YOLO_ENGINE):
+        fp16_backup = config.YOLO_ENGINE + ".fp16"
+        shutil.move(config.YOLO_ENGINE, fp16_backup)
+
+    try:
+        # Equivalent to: yolo export model=yolov8n.pt format=engine int8=True data=calib.yaml imgsz=640
+        engine = YOLO(config.YOLO_MODEL).export(
+            format="engine", int8=True, data=CALIB_YAML, imgsz=config.YOLO_IMGSZ
+        )
+        shutil.move(engine, config.YOLO_MODEL_INT8)
+    finally:
+        if fp16_backup:
+            shutil.move(fp16_backup, config.YOLO_ENGINE)
+
+    return config.YOLO_MODEL_INT8
+
+
+def main():
+    num_frames = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+    print(f"Capturing {num_frames} calibration frames...")
+    saved = capture_frames(num_frames)
+    if saved == 0:
+        return
+    print(f"Saved {saved} frames to {CALIB_DIR}/images")
+
+    write_dataset_yaml()
+
+    print("Exporting INT8 TensorRT engine (this takes a few minutes)...")
+    print(f"Done! Engine written to {export_int8()}")
+
+
+if __name__ == "__main__":
+    main()
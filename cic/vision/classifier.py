@@ -4,10 +4,78 @@ Uniform Classifier
 Classifies detected people as staff or patient based on clothing color.
 """
 
-from typing import Literal, Tuple
+from typing import List, Literal, Optional, Tuple
 import numpy as np
 import cv2
 
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    prange = range
+    NUMBA_AVAILABLE = False
+
+
+def _torso_stats_loop(bgr, gl, gh, bl, bh):
+    """
+    One pass over a BGR uint8 crop: green/blue in-range ratios and mean HSV.
+
+    Converts each pixel with OpenCV's 8-bit HSV formula (H in 0-180), so the
+    range checks match cv2.cvtColor + cv2.inRange without allocating an HSV
+    buffer or any masks. Returns (green_ratio, blue_ratio, mean_h, mean_s, mean_v).
+    """
+    rows, cols = bgr.shape[0], bgr.shape[1]
+    green = 0
+    blue = 0
+    sum_h = 0
+    sum_s = 0
+    sum_v = 0
+
+    for y in prange(rows):
+        for x in range(cols):
+            b = np.int32(bgr[y, x, 0])
+            g = np.int32(bgr[y, x, 1])
+            r = np.int32(bgr[y, x, 2])
+
+            v = max(r, g, b)
+            diff = v - min(r, g, b)
+
+            s = 0
+            if v > 0:
+                s = int(diff * 255.0 / v + 0.5)
+
+            h = 0
+            if diff > 0:
+                if v == r:
+                    hf = 60.0 * (g - b) / diff
+                elif v == g:
+                    hf = 120.0 + 60.0 * (b - r) / diff
+                else:
+                    hf = 240.0 + 60.0 * (r - g) / diff
+                if hf < 0:
+                    hf += 360.0
+                h = int(hf / 2.0 + 0.5)
+                if h >= 180:
+                    h -= 180
+
+            if gl[0] <= h <= gh[0] and gl[1] <= s <= gh[1] and gl[2] <= v <= gh[2]:
+                green += 1
+            if bl[0] <= h <= bh[0] and bl[1] <= s <= bh[1] and bl[2] <= v <= bh[2]:
+                blue += 1
+            sum_h += h
+            sum_s += s
+            sum_v += v
+
+    n = rows * cols
+    return green / n, blue / n, sum_h / n, sum_s / n, sum_v / n
+
+
+if NUMBA_AVAILABLE:
+    # Rows run in parallel; the counters are prange sum-reductions
+    torso_stats = njit(parallel=True, fastmath=True, cache=True)(_torso_stats_loop)
+else:
+    torso_stats = None
+
 
 class UniformClassifier:
     """
@@ -17,22 +85,49 @@ class UniformClassifier:
     Patient: White/gray or other colors
     """
 
+    # (width, height) torsos are resized to for classify_tiled
+    BATCH_CROP_SIZE = (32, 64)
+
     def __init__(self):
+        # Bounds are uint8 to match the HSV image (no per-call dtype conversion)
         # Green range for staff (HSV)
-        self.staff_lower = np.array([35, 40, 40])
-        self.staff_upper = np.array([85, 255, 255])
+        self.staff_lower = np.array([35, 40, 40], dtype=np.uint8)
+        self.staff_upper = np.array([85, 255, 255], dtype=np.uint8)
 
         # Blue range for staff alternative (HSV)
-        self.staff_blue_lower = np.array([100, 40, 40])
-        self.staff_blue_upper = np.array([130, 255, 255])
+        self.staff_blue_lower = np.array([100, 40, 40], dtype=np.uint8)
+        self.staff_blue_upper = np.array([130, 255, 255], dtype=np.uint8)
 
         # Minimum ratio of colored pixels to classify as staff
         self.staff_threshold = 0.15
 
+    @staticmethod
+    def _torso_region(shape: Tuple[int, ...], bbox: Tuple[int, int, int, int]) -> Optional[Tuple[slice, slice]]:
+        """Row/column slices of the torso (15-55% of box height), or None if empty."""
+        x1, y1, x2, y2 = bbox
+
+        # Validate bbox
+        if x1 >= x2 or y1 >= y2:
+            return None
+
+        # Get upper body region (torso)
+        h = y2 - y1
+        torso_y1 = max(0, y1 + int(h * 0.15))
+        torso_y2 = min(shape[0], y1 + int(h * 0.55))
+        x1 = max(0, x1)
+        x2 = min(shape[1], x2)
+
+        if torso_y1 >= torso_y2 or x1 >= x2:
+            return None
+        return slice(torso_y1, torso_y2), slice(x1, x2)
+
     def classify(self, frame: np.ndarray, bbox: Tuple[int, int, int, int]) -> Literal["staff", "patient"]:
         """
         Classify a detected person as staff or patient.
 
+        Converts only the torso to HSV. When classifying several people in
+        the same frame, use classify_tiled instead.
+
         Args:
             frame: Full BGR image
             bbox: (x1, y1, x2, y2) bounding box
@@ -40,27 +135,76 @@ class UniformClassifier:
         Returns:
             "staff" or "patient"
         """
-        x1, y1, x2, y2 = bbox
-
-        # Validate bbox
-        if x1 >= x2 or y1 >= y2:
+        region = self._torso_region(frame.shape, bbox)
+        if region is None:
             return "patient"
 
-        # Get upper body region (torso)
-        h = y2 - y1
-        torso_y1 = max(0, y1 + int(h * 0.15))
-        torso_y2 = min(frame.shape[0], y1 + int(h * 0.55))
-        x1 = max(0, x1)
-        x2 = min(frame.shape[1], x2)
+        if torso_stats is not None:
+            # Fused HSV conversion + range checks, no temporaries
+            green_ratio, blue_ratio, _, _, _ = torso_stats(
+                frame[region], self.staff_lower, self.staff_upper,
+                self.staff_blue_lower, self.staff_blue_upper)
+            return self._label(green_ratio, blue_ratio)
 
-        torso = frame[torso_y1:torso_y2, x1:x2]
+        # Convert to HSV
+        hsv = cv2.cvtColor(frame[region], cv2.COLOR_BGR2HSV)
+        return self._classify_torso(hsv)
 
-        if torso.size == 0:
-            return "patient"
+    def classify_tiled(self, frame: np.ndarray,
+                       bboxes: List[Tuple[int, int, int, int]]) -> List[Literal["staff", "patient"]]:
+        """
+        Classify every person in a BGR frame with a fixed number of OpenCV calls.
 
-        # Convert to HSV
-        hsv = cv2.cvtColor(torso, cv2.COLOR_BGR2HSV)
+        Torsos are resized to BATCH_CROP_SIZE and stacked into one (N*h, w, 3)
+        tile, which gets a single cvtColor and one inRange per colour. Only
+        torso pixels are converted, so no full-frame HSV image is needed.
+
+        Args:
+            frame: Full BGR image
+            bboxes: (x1, y1, x2, y2) bounding boxes
+
+        Returns:
+            "staff" or "patient" per bbox, in order
+        """
+        crops, idx = self._batch_torsos(frame, bboxes)
+        if not crops:
+            return ["patient"] * len(bboxes)
 
+        hsv = cv2.cvtColor(np.vstack(crops), cv2.COLOR_BGR2HSV)
+        n = len(crops)
+        # Masks are 0/255, so the per-tile mean is 255 * in-range ratio
+        green = cv2.inRange(hsv, self.staff_lower, self.staff_upper).reshape(n, -1)
+        blue = cv2.inRange(hsv, self.staff_blue_lower, self.staff_blue_upper).reshape(n, -1)
+        limit = self.staff_threshold * 255
+        is_staff = (green.mean(axis=1) > limit) | (blue.mean(axis=1) > limit)
+        return self._batch_labels(len(bboxes), idx, is_staff)
+
+    def _batch_torsos(self, image: np.ndarray,
+                      bboxes: List[Tuple[int, int, int, int]]) -> Tuple[List[np.ndarray], List[int]]:
+        """
+        Torsos resized to BATCH_CROP_SIZE (nearest neighbour, so no blended
+        hues), plus the index of the bbox each one came from.
+        """
+        crops, idx = [], []
+        for i, bbox in enumerate(bboxes):
+            region = self._torso_region(image.shape, bbox)
+            if region is not None:
+                crops.append(cv2.resize(image[region], self.BATCH_CROP_SIZE,
+                                        interpolation=cv2.INTER_NEAREST))
+                idx.append(i)
+        return crops, idx
+
+    @staticmethod
+    def _batch_labels(count: int, idx: List[int], is_staff: np.ndarray) -> List[Literal["staff", "patient"]]:
+        """Scatter per-crop staff flags back to one label per bbox."""
+        labels = ["patient"] * count
+        for i, staff in zip(idx, is_staff):
+            if staff:
+                labels[i] = "staff"
+        return labels
+
+    def _classify_torso(self, hsv: np.ndarray) -> Literal["staff", "patient"]:
+        """Staff if enough of the HSV torso crop is scrub green or blue."""
         # Check for green (staff scrubs)
         green_mask = cv2.inRange(hsv, self.staff_lower, self.staff_upper)
         green_ratio = cv2.countNonZero(green_mask) / green_mask.size
@@ -69,7 +213,10 @@ class UniformClassifier:
         blue_mask = cv2.inRange(hsv, self.staff_blue_lower, self.staff_blue_upper)
         blue_ratio = cv2.countNonZero(blue_mask) / blue_mask.size
 
-        # If enough green or blue pixels, classify as staff
+        return self._label(green_ratio, blue_ratio)
+
+    def _label(self, green_ratio: float, blue_ratio: float) -> Literal["staff", "patient"]:
+        """Staff if enough pixels are green or blue."""
         if green_ratio > self.staff_threshold or blue_ratio > self.staff_threshold:
             return "staff"
 
@@ -93,6 +240,12 @@ class UniformClassifier:
         if torso.size == 0:
             return (0, 0, 0)
 
+        if torso_stats is not None:
+            _, _, mean_h, mean_s, mean_v = torso_stats(
+                torso, self.staff_lower, self.staff_upper,
+                self.staff_blue_lower, self.staff_blue_upper)
+            return (int(mean_h), int(mean_s), int(mean_v))
+
         hsv = cv2.cvtColor(torso, cv2.COLOR_BGR2HSV)
 
         # Calculate mean color
@@ -4,23 +4,33 @@ Person Detector
 YOLOv8-based person detection.
 """
 
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 from dataclasses import dataclass
+import os
 import numpy as np
 
 try:
     from ultralytics import YOLO
+    import torch
     YOLO_AVAILABLE = True
+    CUDA_AVAILABLE = torch.cuda.is_available()
 except ImportError:
     YOLO_AVAILABLE = False
+    CUDA_AVAILABLE = False
     print("Warning: ultralytics not installed. Run: pip install ultralytics")
 
+try:
+    from cic import config
+except ImportError:
+    import config
+
 
 @dataclass
 class Detection:
     """Single person detection result."""
     bbox: Tuple[int, int, int, int]  # (x1, y1, x2, y2)
     confidence: float
+    track_id: Optional[int] = None   # YOLO tracker ID (when tracking is enabled)
 
     @property
     def center(self) -> Tuple[int, int]:
@@ -46,15 +56,31 @@ class PersonDetector:
         detections = detector.detect(frame)
     """
 
-    def __init__(self, model_name: str = "yolov8n.pt", confidence: float = 0.5):
+    def __init__(self, model_name: str = config.YOLO_MODEL, confidence: float = 0.5,
+                 use_tracker: bool = True, engine_path: Optional[str] = config.YOLO_ENGINE):
         """
         Args:
             model_name: YOLO model to use (yolov8n.pt is fastest)
             confidence: Minimum confidence threshold
+            use_tracker: Run YOLO's built-in tracker and attach track IDs
+            engine_path: TensorRT engine used instead of model_name on CUDA
+                         if the file exists (see export_engine)
         """
         self.confidence = confidence
+        self.use_tracker = use_tracker
         self.model = None
 
+        # Prefer a TensorRT engine on CUDA (INT8, then FP16); plain .pt weights run in FP16 there
+        candidates = [engine_path]
+        if config.YOLO_USE_INT8:
+            candidates.insert(0, config.YOLO_MODEL_INT8)
+        engine = next((e for e in candidates if e and os.path.exists(e)), None)
+
+        self.is_engine = bool(CUDA_AVAILABLE and engine)
+        if self.is_engine:
+            model_name = engine
+        self.half = CUDA_AVAILABLE and not self.is_engine
+
         if YOLO_AVAILABLE:
             print(f"Loading YOLO model: {model_name}")
             self.model = YOLO(model_name)
@@ -75,26 +101,30 @@ class PersonDetector:
         if self.model is None:
             return []
 
-        # Run inference
-        results = self.model(frame, verbose=False)
+        # Run inference (tracking keeps IDs persistent across calls)
+        if self.use_tracker:
+            results = self.model.track(frame, persist=True, classes=[0], verbose=False,
+                                       imgsz=config.YOLO_IMGSZ, half=self.half)
+        else:
+            results = self.model(frame, verbose=False, imgsz=config.YOLO_IMGSZ, half=self.half)
 
         detections = []
         for result in results:
-            boxes = result.boxes
-            if boxes is None:
+            if result.boxes is None or len(result.boxes) == 0:
                 continue
 
-            for i in range(len(boxes)):
-                # Class 0 is 'person' in COCO
-                cls = int(boxes.cls[i])
-                conf = float(boxes.conf[i])
+            # One device->host copy of the whole box tensor, then filter as arrays
+            boxes = result.boxes.cpu().numpy()
+            # Class 0 is 'person' in COCO
+            keep = (boxes.cls == 0) & (boxes.conf >= self.confidence)
+            xyxy = boxes.xyxy[keep].astype(np.int32).tolist()
+            conf = boxes.conf[keep].tolist()
+            ids = boxes.id[keep].astype(np.int64).tolist() if boxes.id is not None else [None] * len(conf)
 
-                if cls == 0 and conf >= self.confidence:
-                    x1, y1, x2, y2 = boxes.xyxy[i].cpu().numpy()
-                    detections.append(Detection(
-                        bbox=(int(x1), int(y1), int(x2), int(y2)),
-                        confidence=conf
-                    ))
+            detections.extend(
+                Detection(bbox=tuple(b), confidence=c, track_id=t)
+                for b, c, t in zip(xyxy, conf, ids)
+            )
 
         return detections
 
@@ -112,3 +142,21 @@ class PersonDetector:
                        (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
 
         return frame_copy, detections
+
+
+def export_engine(model_name: str = config.YOLO_MODEL, imgsz: int = config.YOLO_IMGSZ) -> str:
+    """
+    One-time TensorRT FP16 export of a YOLO model (needs a CUDA GPU).
+
+    Equivalent to: yolo export model=yolov8n.pt format=engine half=True workspace=4 imgsz=640
+
+    Returns:
+        Path of the written .engine file
+    """
+    if not YOLO_AVAILABLE:
+        raise RuntimeError("ultralytics not installed")
+    return YOLO(model_name).export(format="engine", half=True, workspace=4, imgsz=imgsz)
+
+
+if __name__ == "__main__":
+    print(f"Exported: {export_engine()}")
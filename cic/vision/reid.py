@@ -12,6 +12,12 @@ import cv2
 from typing import Optional, Tuple, List
 from dataclasses import dataclass
 
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
 
 @dataclass
 class ReIDMatch:
@@ -21,6 +27,67 @@ class ReIDMatch:
     signature: np.ndarray
 
 
+def _hist_from_bgr_loop(crop, bins):
+    """
+    H/S/V histograms straight from a BGR uint8 crop, without an HSV buffer.
+
+    Uses OpenCV's 8-bit HSV formula (H in 0-180, S/V in 0-256) so the bins
+    match cv2.cvtColor + cv2.calcHist. Returns float32 (3 * bins,).
+    """
+    hist = np.zeros(3 * bins, dtype=np.float32)
+    rows, cols = crop.shape[0], crop.shape[1]
+
+    for y in range(rows):
+        for x in range(cols):
+            b = np.int32(crop[y, x, 0])
+            g = np.int32(crop[y, x, 1])
+            r = np.int32(crop[y, x, 2])
+
+            v = max(r, g, b)
+            diff = v - min(r, g, b)
+
+            s = 0
+            if v > 0:
+                s = int(diff * 255.0 / v + 0.5)
+
+            h = 0
+            if diff > 0:
+                if v == r:
+                    hf = 60.0 * (g - b) / diff
+                elif v == g:
+                    hf = 120.0 + 60.0 * (b - r) / diff
+                else:
+                    hf = 240.0 + 60.0 * (r - g) / diff
+                if hf < 0:
+                    hf += 360.0
+                h = int(hf / 2.0 + 0.5)
+                if h >= 180:
+                    h -= 180
+
+            hist[h * bins // 180] += 1.0
+            hist[bins + s * bins // 256] += 1.0
+            hist[2 * bins + v * bins // 256] += 1.0
+
+    # Per-channel L2 normalization (same as cv2.normalize's default)
+    for c in range(3):
+        norm = 0.0
+        for i in range(c * bins, (c + 1) * bins):
+            norm += hist[i] * hist[i]
+        if norm > 0:
+            norm = np.sqrt(norm)
+            for i in range(c * bins, (c + 1) * bins):
+                hist[i] /= norm
+
+    return hist
+
+
+if NUMBA_AVAILABLE:
+    # Serial on purpose: a parallel loop would race on the shared bins
+    hist_from_bgr = njit(fastmath=True, cache=True)(_hist_from_bgr_loop)
+else:
+    hist_from_bgr = None
+
+
 class ReIDExtractor:
     """
     Extracts visual signatures from person crops.
@@ -45,7 +112,7 @@ class ReIDExtractor:
             bbox: (x1, y1, x2, y2) bounding box
 
         Returns:
-            Flattened color histogram as signature vector
+            L2-normalized float32 color histogram as signature vector
         """
         x1, y1, x2, y2 = bbox
 
@@ -58,23 +125,34 @@ class ReIDExtractor:
         crop = frame[torso_y1:torso_y2, x1:x2]
 
         if crop.size == 0:
-            return np.zeros(self.hist_bins * 3)
+            return np.zeros(self.hist_bins * 3, dtype=np.float32)
+
+        # Single fused pass from BGR when Numba is available
+        if hist_from_bgr is not None:
+            signature = hist_from_bgr(np.ascontiguousarray(crop), self.hist_bins)
+            signature /= np.linalg.norm(signature) + 1e-12
+            return signature
 
         # Convert to HSV for better color matching
         hsv = cv2.cvtColor(crop, cv2.COLOR_BGR2HSV)
 
-        # Calculate histogram for each channel
-        hist_h = cv2.calcHist([hsv], [0], None, [self.hist_bins], [0, 180])
-        hist_s = cv2.calcHist([hsv], [1], None, [self.hist_bins], [0, 256])
-        hist_v = cv2.calcHist([hsv], [2], None, [self.hist_bins], [0, 256])
+        # Calculate histogram for each channel straight into the signature
+        bins = self.hist_bins
+        signature = np.empty(3 * bins, dtype=np.float32)
+        hist_h = signature[0:bins].reshape(bins, 1)
+        hist_s = signature[bins:2 * bins].reshape(bins, 1)
+        hist_v = signature[2 * bins:].reshape(bins, 1)
+
+        cv2.calcHist([hsv], [0], None, [bins], [0, 180], hist=hist_h, accumulate=False)
+        cv2.calcHist([hsv], [1], None, [bins], [0, 256], hist=hist_s, accumulate=False)
+        cv2.calcHist([hsv], [2], None, [bins], [0, 256], hist=hist_v, accumulate=False)
 
-        # Normalize histograms
+        # Normalize histograms (in place, on the signature slices)
         cv2.normalize(hist_h, hist_h)
         cv2.normalize(hist_s, hist_s)
         cv2.normalize(hist_v, hist_v)
 
-        # Concatenate into single signature
-        signature = np.concatenate([hist_h, hist_s, hist_v]).flatten()
+        signature /= np.linalg.norm(signature) + 1e-12
 
         return signature
 
@@ -95,17 +173,21 @@ class ReIDMatcher:
         # Enrolled patient signatures: patient_id -> signature
         self._enrolled: dict[str, np.ndarray] = {}
 
+        # Stacked (N, D) gallery for matrix matching; rebuilt after enroll/unenroll
+        self._gallery_ids: List[str] = []
+        self._gallery: Optional[np.ndarray] = None
+
     def enroll(self, patient_id: str, signature: np.ndarray):
         """
         Enroll a patient with their visual signature.
 
         Called when nurse captures patient's appearance at intake.
         """
-        # Normalize signature
-        norm = np.linalg.norm(signature)
-        if norm > 0:
-            signature = signature / norm
-        self._enrolled[patient_id] = signature
+        # Store as contiguous float32, normalized once here
+        sig = np.array(signature, dtype=np.float32, order='C')
+        sig /= np.linalg.norm(sig) + 1e-12
+        self._enrolled[patient_id] = sig
+        self._gallery = None
 
     def enroll_from_frame(self, patient_id: str, frame: np.ndarray, bbox: Tuple[int, int, int, int]):
         """
@@ -118,44 +200,56 @@ class ReIDMatcher:
         """Remove a patient's enrollment (e.g., on discharge)."""
         if patient_id in self._enrolled:
             del self._enrolled[patient_id]
+            self._gallery = None
+
+    def _get_gallery(self) -> np.ndarray:
+        """(N, D) float32 matrix of enrolled signatures, rows in _gallery_ids order."""
+        if self._gallery is None:
+            self._gallery_ids = list(self._enrolled.keys())
+            self._gallery = np.stack(list(self._enrolled.values())).astype(np.float32, copy=False)
+        return self._gallery
 
     def match(self, signature: np.ndarray) -> Optional[ReIDMatch]:
         """
         Find the best matching enrolled patient for a signature.
 
         Args:
-            signature: Visual signature to match
+            signature: L2-normalized signature from ReIDExtractor
 
         Returns:
             ReIDMatch if found above threshold, None otherwise
         """
         if len(self._enrolled) == 0:
             return None
+        return self.match_batch(signature[np.newaxis, :])[0]
 
-        # Normalize input signature
-        norm = np.linalg.norm(signature)
-        if norm > 0:
-            signature = signature / norm
-
-        best_match = None
-        best_score = 0.0
-
-        for patient_id, enrolled_sig in self._enrolled.items():
-            # Cosine similarity
-            similarity = np.dot(signature, enrolled_sig)
-
-            if similarity > best_score:
-                best_score = similarity
-                best_match = patient_id
+    def match_batch(self, signatures: np.ndarray) -> List[Optional[ReIDMatch]]:
+        """
+        Match many signatures at once with one (M, D) @ (D, N) product.
 
-        if best_score >= self.threshold and best_match:
-            return ReIDMatch(
-                patient_id=best_match,
-                confidence=best_score,
-                signature=signature
-            )
+        Args:
+            signatures: (M, D) L2-normalized signatures from ReIDExtractor
 
-        return None
+        Returns:
+            ReIDMatch or None per row, in order
+        """
+        signatures = np.asarray(signatures, dtype=np.float32)
+        if len(self._enrolled) == 0 or len(signatures) == 0:
+            return [None] * len(signatures)
+
+        # Cosine similarity of every signature against every enrolled patient
+        sims = signatures @ self._get_gallery().T
+        best = sims.argmax(axis=1)
+        best_scores = sims[np.arange(len(signatures)), best]
+
+        return [
+            ReIDMatch(
+                patient_id=self._gallery_ids[idx],
+                confidence=float(score),
+                signature=sig
+            ) if score > 0 and score >= self.threshold else None
+            for sig, idx, score in zip(signatures, best, best_scores)
+        ]
 
     def match_from_frame(self, frame: np.ndarray, bbox: Tuple[int, int, int, int]) -> Optional[ReIDMatch]:
         """
@@ -1,14 +1,25 @@
+import os
+import threading
+import queue
 import cv2
 import numpy as np
+import torch
 from ultralytics import YOLO
 
 # --- CONFIGURATION ---
 # Load a pre-trained YOLO model (n for nano is fastest)
-model = YOLO('yolov8n.pt') 
+# Prebuilt TensorRT FP16 engine for fixed-shape batches of 4 if present (same API), else .pt
+#   YOLO('yolov8n.pt').export(format='engine', half=True, imgsz=640, batch=4)
+if torch.cuda.is_available() and os.path.exists('yolov8n.engine'):
+    model = YOLO('yolov8n.engine', task='detect')
+else:
+    model = YOLO('yolov8n.pt')
 
 # Map dimensions (simulating a hospital floor plan)
 MAP_WIDTH, MAP_HEIGHT = 600, 600
-map_img = np.zeros((MAP_HEIGHT, MAP_WIDTH, 3), dtype=np.uint8)
+# White map background, built once; each frame restores it with one copy
+blank_map = np.full((MAP_HEIGHT, MAP_WIDTH, 3), 255, dtype=np.uint8)
+display_map = blank_map.copy()
 
 # --- CALIBRATION VARIABLES ---
 # Adjusted to cover the full width of the bottom half of the screen
@@ -20,6 +31,9 @@ src_points = np.float32([
     [245, 1073]   # Bottom-Left
 ])
 
+# Calibration outline as int32 for polylines, drawn every frame
+SRC_POINTS_I32 = np.int32(src_points)
+
 # These map to the 4 corners of our top-down map
 dst_points = np.float32([
     [0, 0],                  # Map Top-Left
@@ -39,84 +53,114 @@ dst_points = np.float32([
 # Calculate the Homography Matrix
 matrix = cv2.getPerspectiveTransform(src_points, dst_points)
 
-def get_foot_position(box):
+def get_foot_positions(boxes):
     """
-    Calculates the bottom center of the bounding box (the feet).
+    Calculates the bottom center of every bounding box (the feet).
+    Returns a (K, 2) float32 array.
     """
-    x1, y1, x2, y2 = box
-    foot_x = int((x1 + x2) / 2)
-    foot_y = int(y2)
-    return (foot_x, foot_y)
+    return np.stack([(boxes[:, 0] + boxes[:, 2]) * 0.5, boxes[:, 3]], axis=1).astype(np.float32)
 
-def transform_point(point, matrix):
+def transform_points(points, matrix):
     """
     Applies the homography matrix to convert camera coords to map coords.
+    All K points go through a single cv2.perspectiveTransform call.
     """
-    # Reshape point to be compatible with cv2.perspectiveTransform
-    # Shape needs to be (1, 1, 2)
-    p = np.array([[[point[0], point[1]]]], dtype=np.float32)
-    transformed = cv2.perspectiveTransform(p, matrix)
-    
-    # Extract coordinates
-    tx = int(transformed[0][0][0])
-    ty = int(transformed[0][0][1])
-    return (tx, ty)
+    # Shape needs to be (K, 1, 2)
+    transformed = cv2.perspectiveTransform(points.reshape(-1, 1, 2), matrix)
+    return transformed.reshape(-1, 2).astype(np.int32)
 
 # --- MAIN LOOP ---
 cap = cv2.VideoCapture(0) # 0 for default webcam
 # print(f"Camera Resolution: {cap.get(3)} x {cap.get(4)}")
 
-while True:
-    ret, frame = cap.read()
-    if not ret:
-        break
-    
-    # Reset map for this frame (clear previous dots)
-    # In a real app, you might want to keep trails or use a static map image background
-    display_map = map_img.copy()
-    cv2.rectangle(display_map, (0,0), (MAP_WIDTH, MAP_HEIGHT), (255, 255, 255), -1) # White background
+# Frames are tracked BATCH at a time: one YOLO call per batch, then each
+# frame is drawn and shown in order. ultralytics>=8.3 runs a list batch through
+# one tracker in order (8.0.x kept a tracker per batch index, so IDs flipped)
+BATCH = 4
+frame_buf = []
+quit_requested = False
+
+# Capture runs in its own thread so reading the camera overlaps with YOLO.
+# The queue holds one batch; when inference falls behind the oldest frame is dropped.
+frame_queue = queue.Queue(maxsize=BATCH)  # None = camera ended
+stop_event = threading.Event()
+
+def put_latest(q, item):
+    """Non-blocking put; drops the oldest queued item when full"""
+    try:
+        q.put_nowait(item)
+    except queue.Full:
+        try: q.get_nowait()
+        except queue.Empty: pass
+        q.put_nowait(item)
+
+def capture_loop():
+    # Every frame is queued; put_latest evicts the stalest one when full, so
+    # inference always gets the newest BATCH frames
+    while not stop_event.is_set():
+        if not cap.grab():
+            put_latest(frame_queue, None); break
+        ret, frame = cap.retrieve()
+        if ret:
+            put_latest(frame_queue, frame)
+
+capture_thread = threading.Thread(target=capture_loop, daemon=True)
+capture_thread.start()
+
+while not quit_requested:
+    frame = frame_queue.get()
+    if frame is None: break
+    frame_buf.append(frame)
+    if len(frame_buf) < BATCH:
+        continue
+
+    results_list = model.track(frame_buf, persist=True, classes=[0], verbose=False) # class 0 is Person
+    for frame, result in zip(frame_buf, results_list):
+        # Reset map for this frame (clear previous dots)
+        # In a real app, you might want to keep trails or use a static map image background
+        np.copyto(display_map, blank_map)
     
-    # 1. Run YOLO Tracking
-    # persist=True allows the model to assign unique IDs to people across frames
-    results = model.track(frame, persist=True, classes=[0], verbose=False) # class 0 is Person
-
-    # Visualize calibration points on camera feed (for debugging)
-    cv2.polylines(frame, [np.int32(src_points)], True, (0, 255, 255), 2)
-
-    if results[0].boxes.id is not None:
-        # Get boxes and IDs
-        boxes = results[0].boxes.xyxy.cpu().numpy()
-        track_ids = results[0].boxes.id.int().cpu().numpy()
-
-        for box, track_id in zip(boxes, track_ids):
-            # 2. Get Foot Position
-            foot_pos = get_foot_position(box)
-            
-            # 3. Translate to Map Coordinates
-            map_pos = transform_point(foot_pos, matrix)
+        # Visualize calibration points on camera feed (for debugging)
+        cv2.polylines(frame, [SRC_POINTS_I32], True, (0, 255, 255), 2)
+
+        if result.boxes.id is not None:
+            # One device->host copy for boxes and IDs (tracked rows: x1, y1, x2, y2, id, conf, cls)
+            det = result.boxes.data.cpu().numpy()
+            boxes = det[:, :4].astype(np.int32)
+            track_ids = det[:, 4].astype(np.int32).tolist()
+
+            # 2. Get Foot Positions and 3. Translate to Map Coordinates (all people at once)
+            foot_pts = get_foot_positions(boxes)
+            map_pts = transform_points(foot_pts, matrix).tolist()
+            foot_pts = foot_pts.astype(np.int32).tolist()
+
+            for box, track_id, foot_pos, map_pos in zip(boxes.tolist(), track_ids, map(tuple, foot_pts), map(tuple, map_pts)):
+                # --- VISUALIZATION ---
             
-            # --- VISUALIZATION ---
-            
-            # Draw on Camera View
-            x1, y1, x2, y2 = map(int, box)
-            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-            cv2.circle(frame, foot_pos, 5, (0, 0, 255), -1)
-            cv2.putText(frame, f"ID: {track_id}", (x1, y1 - 10), 
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-
-            # Draw on Top-Down Map
-            # Check if point is inside map bounds before drawing
-            if 0 <= map_pos[0] < MAP_WIDTH and 0 <= map_pos[1] < MAP_HEIGHT:
-                cv2.circle(display_map, map_pos, 10, (255, 0, 0), -1) # Blue dot for patient
-                cv2.putText(display_map, f"ID {track_id}", (map_pos[0]+15, map_pos[1]), 
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1)
-
-    # Show the dual display
-    cv2.imshow("Hospital CCTV - Patient Tracking", frame)
-    cv2.imshow("Top-Down Map Display", display_map)
-
-    if cv2.waitKey(1) & 0xFF == ord('q'):
-        break
-
+                # Draw on Camera View
+                x1, y1, x2, y2 = box
+                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+                cv2.circle(frame, foot_pos, 5, (0, 0, 255), -1)
+                cv2.putText(frame, f"ID: {track_id}", (x1, y1 - 10), 
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+
+                # Draw on Top-Down Map
+                # Check if point is inside map bounds before drawing
+                if 0 <= map_pos[0] < MAP_WIDTH and 0 <= map_pos[1] < MAP_HEIGHT:
+                    cv2.circle(display_map, map_pos, 10, (255, 0, 0), -1) # Blue dot for patient
+                    cv2.putText(display_map, f"ID {track_id}", (map_pos[0]+15, map_pos[1]), 
+                                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 0), 1)
+
+        # Show the dual display
+        cv2.imshow("Hospital CCTV - Patient Tracking", frame)
+        cv2.imshow("Top-Down Map Display", display_map)
+
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            quit_requested = True
+            break
+    frame_buf = []
+
+stop_event.set()
+capture_thread.join()
 cap.release()
 cv2.destroyAllWindows()
@@ -1,14 +1,26 @@
+import os
+import threading
+import queue
+from collections import OrderedDict
 import cv2
 import numpy as np
+import torch
 from ultralytics import YOLO
 
 # --- CONFIGURATION ---
 # Load the model
-model = YOLO('yolov8n.pt') 
+# Prebuilt TensorRT FP16 engine for fixed-shape batches of 4 if present (same API), else .pt
+#   YOLO('yolov8n.pt').export(format='engine', half=True, imgsz=640, batch=4)
+if torch.cuda.is_available() and os.path.exists('yolov8n.engine'):
+    model = YOLO('yolov8n.engine', task='detect')
+else:
+    model = YOLO('yolov8n.pt')
 
 # Map dimensions (The size of the white window)
 MAP_WIDTH, MAP_HEIGHT = 600, 600
-map_img = np.zeros((MAP_HEIGHT, MAP_WIDTH, 3), dtype=np.uint8)
+# White map background, built once; each frame restores it with one copy
+blank_map = np.full((MAP_HEIGHT, MAP_WIDTH, 3), 255, dtype=np.uint8)
+display_map = blank_map.copy()
 
 # --- CALIBRATION (SCALED FOR 1920x1080) ---
 # I have scaled the previous "skirting board" coordinates 
@@ -20,6 +32,9 @@ src_points = np.float32([
     [408, 1071]   # Bottom-Left
 ])
 
+# Calibration outline as int32 for polylines, drawn every frame
+SRC_POINTS_I32 = np.int32(src_points)
+
 dst_points = np.float32([
     [0, 0],                  
     [MAP_WIDTH, 0],          
@@ -30,9 +45,18 @@ dst_points = np.float32([
 matrix = cv2.getPerspectiveTransform(src_points, dst_points)
 
 # --- PATIENT RE-IDENTIFICATION SYSTEM ---
-# Stores { global_id : (shirt_hist, pants_hist) }
-patient_db = {}  
+# Stores { global_id : (shirt_hist, pants_hist) }, least recently seen first.
+# Capped at MAX_PATIENTS so the per-person search stays short over a long shift
+patient_db = OrderedDict()
 next_global_id = 1
+MAX_PATIENTS = 256
+
+def store_patient(global_id, hists):
+    """Saves a fingerprint as most recently seen; evicts the stalest patient when over the cap."""
+    patient_db[global_id] = hists
+    patient_db.move_to_end(global_id)
+    if len(patient_db) > MAX_PATIENTS:
+        patient_db.popitem(last=False)
 
 # Similarity Threshold (0.0 to 1.0)
 # Lower = Easier to match (less strict)
@@ -44,6 +68,7 @@ def get_patient_fingerprint(image_crop):
     """
     UPGRADE 1: Splits the person into Shirt (Top) and Pants (Bottom).
     This prevents 'Red Shirt' matching with 'Red Pants'.
+    image_crop is already HSV (sliced from the frame converted once per frame).
     """
     (h, w) = image_crop.shape[:2]
     
@@ -62,9 +87,8 @@ def get_patient_fingerprint(image_crop):
     shirt_zone = crop[0 : h_c // 2, :]
     pants_zone = crop[h_c // 2 : h_c, :]
     
-    def calc_hist(img_chunk):
-        if img_chunk.size == 0: return None
-        hsv = cv2.cvtColor(img_chunk, cv2.COLOR_BGR2HSV)
+    def calc_hist(hsv):
+        if hsv.size == 0: return None
         # 30 Hue bins, 32 Saturation bins. Ignore Value (brightness)
         hist = cv2.calcHist([hsv], [0, 1], None, [30, 32], [0, 180, 0, 256])
         cv2.normalize(hist, hist, 0, 1, cv2.NORM_MINMAX)
@@ -72,14 +96,12 @@ def get_patient_fingerprint(image_crop):
 
     return (calc_hist(shirt_zone), calc_hist(pants_zone))
 
-def identify_patient(image_crop):
+def identify_patient_hist(curr_shirt, curr_pants):
     """
-    Compares the current person against the database of known patients.
+    Compares the current person's (shirt, pants) fingerprint against the database of known patients.
     """
     global next_global_id
     
-    # Extract current fingerprint
-    curr_shirt, curr_pants = get_patient_fingerprint(image_crop)
     if curr_shirt is None or curr_pants is None: return None, False
 
     best_match_id = None
@@ -103,11 +125,12 @@ def identify_patient(image_crop):
     # print(f"Best match: P{best_match_id} | Score: {highest_score:.2f}")
 
     if highest_score > MATCH_THRESHOLD:
+        patient_db.move_to_end(best_match_id)
         return best_match_id, True  # Returning Patient
     else:
         # Create New Patient
         new_id = next_global_id
-        patient_db[new_id] = (curr_shirt, curr_pants)
+        store_patient(new_id, (curr_shirt, curr_pants))
         next_global_id += 1
         return new_id, False # New Patient
 
@@ -122,82 +145,137 @@ cap = cv2.VideoCapture(0)
 cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1920)
 cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 1080)
 
-while True:
-    ret, frame = cap.read()
-    if not ret: break
-    
-    # Prepare the blank map
-    display_map = map_img.copy()
-    cv2.rectangle(display_map, (0,0), (MAP_WIDTH, MAP_HEIGHT), (255, 255, 255), -1)
-    
-    # Visual Guide: Draw the yellow "Floor Zone" on the camera
-    cv2.polylines(frame, [np.int32(src_points)], True, (0, 255, 255), 2)
+# Frames are tracked BATCH at a time: one YOLO call per batch, then each
+# frame is drawn and shown in order. ultralytics>=8.3 runs a list batch through
+# one tracker in order (8.0.x kept a tracker per batch index, so IDs flipped)
+BATCH = 4
+frame_buf = []
+quit_requested = False
 
-    # 1. Run YOLO Tracking
-    results = model.track(frame, persist=True, classes=[0], verbose=False)
+# Known tracks are re-fingerprinted for the adaptive update only every Nth frame;
+# new track IDs are still identified on the frame they appear
+REID_UPDATE_INTERVAL = 15
+frame_idx = 0
 
-    if results[0].boxes.id is not None:
-        boxes = results[0].boxes.xyxy.cpu().numpy()
-        track_ids = results[0].boxes.id.int().cpu().numpy()
+# Capture runs in its own thread so reading the camera overlaps with YOLO.
+# The queue holds one batch; when inference falls behind the oldest frame is dropped.
+frame_queue = queue.Queue(maxsize=BATCH)  # None = camera ended
+stop_event = threading.Event()
 
-        for box, track_id in zip(boxes, track_ids):
-            x1, y1, x2, y2 = map(int, box)
-            
-            # --- IDENTITY CHECK ---
-            # Extract crop of the person
+def put_latest(q, item):
+    """Non-blocking put; drops the oldest queued item when full"""
+    try:
+        q.put_nowait(item)
+    except queue.Full:
+        try: q.get_nowait()
+        except queue.Empty: pass
+        q.put_nowait(item)
+
+def capture_loop():
+    # Every frame is queued; put_latest evicts the stalest one when full, so
+    # inference always gets the newest BATCH frames
+    while not stop_event.is_set():
+        if not cap.grab():
+            put_latest(frame_queue, None); break
+        ret, frame = cap.retrieve()
+        if ret:
+            put_latest(frame_queue, frame)
+
+capture_thread = threading.Thread(target=capture_loop, daemon=True)
+capture_thread.start()
+
+while not quit_requested:
+    frame = frame_queue.get()
+    if frame is None: break
+    frame_buf.append(frame)
+    if len(frame_buf) < BATCH:
+        continue
+
+    results_list = model.track(frame_buf, persist=True, classes=[0], verbose=False) # class 0 is Person
+    for frame, result in zip(frame_buf, results_list):
+        run_update = frame_idx % REID_UPDATE_INTERVAL == 0
+        frame_idx += 1
+
+        # Prepare the blank map
+        np.copyto(display_map, blank_map)
+    
+        # Visual Guide: Draw the yellow "Floor Zone" on the camera
+        cv2.polylines(frame, [SRC_POINTS_I32], True, (0, 255, 255), 2)
+
+        if result.boxes.id is not None:
+            # One device->host copy for boxes and IDs (tracked rows: x1, y1, x2, y2, id, conf, cls)
+            det = result.boxes.data.cpu().numpy()
+            boxes = det[:, :4].astype(np.int32)
+            track_ids = det[:, 4].astype(np.int32).tolist()
+            # Clip to the frame in place so crops need no per-person max/min
             h_img, w_img, _ = frame.shape
-            # Ensure we don't crash by cropping outside the image
-            face_crop = frame[max(0,y1):min(h_img,y2), max(0,x1):min(w_img,x2)]
+            np.clip(boxes[:, 0::2], 0, w_img, out=boxes[:, 0::2])
+            np.clip(boxes[:, 1::2], 0, h_img, out=boxes[:, 1::2])
+
+            # Only unmapped tracks (or everyone, on an update frame) need a fingerprint
+            needs_reid = [run_update or track_id not in active_track_map for track_id in track_ids]
+
+            # One HSV conversion per frame; each person's crop is a slice of it
+            hsv_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV) if any(needs_reid) else None
+
+            # Feet (bottom centre of each box) -> map coordinates, one transform for everyone
+            feet = np.stack([(boxes[:, 0] + boxes[:, 2]) * 0.5, boxes[:, 3]], axis=1).astype(np.float32)
+            map_pts = cv2.perspectiveTransform(feet.reshape(-1, 1, 2), matrix).reshape(-1, 2).astype(np.int32).tolist()
+
+            for (x1, y1, x2, y2), track_id, (map_x, map_y), reid in zip(boxes.tolist(), track_ids, map_pts, needs_reid):
+                # --- IDENTITY CHECK ---
+                # Extract crop of the person
+                # Boxes are already clipped to the image
+                face_crop = hsv_frame[y1:y2, x1:x2] if reid else None
             
-            if face_crop.size > 0:
-                # If YOLO lost track of this ID (or it's a new ID), check the database
-                if track_id not in active_track_map:
-                    global_id, is_returning = identify_patient(face_crop)
-                    if global_id is not None:
-                        active_track_map[track_id] = global_id
-                        if is_returning:
-                            print(f"DEBUG: Patient {global_id} returned (ID restoration)")
-                
-                # UPGRADE 2: ADAPTIVE UPDATE
-                # Even if we know who they are, we update their photo in the database
-                # This ensures that as they walk into shadows, we remember their "darker" version
-                current_global_id = active_track_map.get(track_id)
-                if current_global_id:
+                if face_crop is not None and face_crop.size > 0:
+                    # Fingerprint once: used for identification and for the adaptive update
                     curr_shirt, curr_pants = get_patient_fingerprint(face_crop)
-                    if curr_shirt is not None:
-                         patient_db[current_global_id] = (curr_shirt, curr_pants)
 
-            # --- MAPPING ---
-            global_display_id = active_track_map.get(track_id, "?")
-            
-            # 1. Calc Feet Position
-            foot_x = int((x1 + x2) / 2)
-            foot_y = int(y2)
+                    # If YOLO lost track of this ID (or it's a new ID), check the database
+                    if track_id not in active_track_map:
+                        global_id, is_returning = identify_patient_hist(curr_shirt, curr_pants)
+                        if global_id is not None:
+                            active_track_map[track_id] = global_id
+                            if is_returning:
+                                print(f"DEBUG: Patient {global_id} returned (ID restoration)")
+                
+                    # UPGRADE 2: ADAPTIVE UPDATE
+                    # Even if we know who they are, we update their photo in the database
+                    # This ensures that as they walk into shadows, we remember their "darker" version
+                    current_global_id = active_track_map.get(track_id)
+                    if current_global_id:
+                        if curr_shirt is not None:
+                             store_patient(current_global_id, (curr_shirt, curr_pants))
+
+                # --- MAPPING ---
+                global_display_id = active_track_map.get(track_id, "?")
             
-            # 2. Transform to Map
-            p = np.array([[[foot_x, foot_y]]], dtype=np.float32)
-            transformed = cv2.perspectiveTransform(p, matrix)
-            map_x, map_y = int(transformed[0][0][0]), int(transformed[0][0][1])
-
-            # 3. Draw on Camera
-            color = (0, 255, 0) # Green box
-            cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
-            cv2.putText(frame, f"P{global_display_id}", (x1, y1 - 10), 
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2)
-
-            # 4. Draw on Map
-            if 0 <= map_x < MAP_WIDTH and 0 <= map_y < MAP_HEIGHT:
-                # Draw dot
-                cv2.circle(display_map, (map_x, map_y), 15, (255, 0, 0), -1)
-                # Draw Text
-                cv2.putText(display_map, f"P{global_display_id}", (map_x+20, map_y), 
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 0), 2)
-
-    cv2.imshow("Hospital CCTV - Patient Tracking", frame)
-    cv2.imshow("Top-Down Map Display", display_map)
-
-    if cv2.waitKey(1) & 0xFF == ord('q'):
-        break
+                # 1-2. Feet position transformed to the map above (map_x, map_y)
+
+                # 3. Draw on Camera
+                color = (0, 255, 0) # Green box
+                cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+                cv2.putText(frame, f"P{global_display_id}", (x1, y1 - 10), 
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2)
+
+                # 4. Draw on Map
+                if 0 <= map_x < MAP_WIDTH and 0 <= map_y < MAP_HEIGHT:
+                    # Draw dot
+                    cv2.circle(display_map, (map_x, map_y), 15, (255, 0, 0), -1)
+                    # Draw Text
+                    cv2.putText(display_map, f"P{global_display_id}", (map_x+20, map_y), 
+                                cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 0), 2)
+
+        cv2.imshow("Hospital CCTV - Patient Tracking", frame)
+        cv2.imshow("Top-Down Map Display", display_map)
+
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            quit_requested = True
+            break
+    frame_buf = []
 
+stop_event.set()
+capture_thread.join()
 cap.release()
 cv2.destroyAllWindows()
\ No newline at end of file
@@ -1,10 +1,12 @@
+import os
+import threading
+import queue
+from collections import OrderedDict
 import cv2
 import numpy as np
 from ultralytics import YOLO
 import torch
-import torchvision.transforms as T
 import torchvision.models as models
-from scipy.spatial.distance import cosine
 
 # --- SYSTEM SETUP ---
 # Detect if we are on Mac Apple Silicon (MPS) or standard CPU
@@ -17,23 +19,37 @@ print(f"Running Neural Network on: {device}")
 feature_extractor = models.resnet18(weights=models.ResNet18_Weights.IMAGENET1K_V1)
 # Remove the final classification layer (we only want the features)
 feature_extractor = torch.nn.Sequential(*(list(feature_extractor.children())[:-1]))
-feature_extractor.to(device)
+# FP16 on the accelerator halves weight/activation traffic; CPU stays FP32
+model_dtype = torch.float16 if device.type in ("mps", "cuda") else torch.float32
+feature_extractor.to(device, dtype=model_dtype)
 feature_extractor.eval() # Set to evaluation mode (no training)
 
-# Standard image preprocessing required by ResNet
-preprocess = T.Compose([
-    T.ToPILImage(),
-    T.Resize((224, 224)),
-    T.ToTensor(),
-    T.Normalize(mean=[0.485, 0.456, 0.406], std=[0.229, 0.224, 0.225]),
-])
+# Standard image preprocessing required by ResNet (ImageNet stats on the 0-255 scale)
+MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32) * 255
+STD = np.array([0.229, 0.224, 0.225], dtype=np.float32) * 255
+
+def preprocess(image_crops):
+    """
+    Resize with OpenCV and normalize in NumPy (no PIL round trip).
+    BGR crops in, (K, 3, 224, 224) RGB float tensor out.
+    """
+    arr = np.stack([cv2.resize(c, (224, 224), interpolation=cv2.INTER_LINEAR) for c in image_crops])
+    arr = (arr[..., ::-1].astype(np.float32) - MEAN) / STD
+    return torch.from_numpy(arr).permute(0, 3, 1, 2)
 
 # --- CONFIGURATION ---
-yolo_model = YOLO('yolov8n.pt') 
+# Prebuilt TensorRT FP16 engine for fixed-shape batches of 4 if present (same API), else .pt
+#   YOLO('yolov8n.pt').export(format='engine', half=True, imgsz=640, batch=4)
+if torch.cuda.is_available() and os.path.exists('yolov8n.engine'):
+    yolo_model = YOLO('yolov8n.engine', task='detect')
+else:
+    yolo_model = YOLO('yolov8n.pt')
 
 # Map dimensions
 MAP_WIDTH, MAP_HEIGHT = 600, 600
-map_img = np.zeros((MAP_HEIGHT, MAP_WIDTH, 3), dtype=np.uint8)
+# White map background, built once; each frame restores it with one copy
+blank_map = np.full((MAP_HEIGHT, MAP_WIDTH, 3), 255, dtype=np.uint8)
+display_map = blank_map.copy()
 
 # --- CALIBRATION (1920x1080) ---
 src_points = np.float32([
@@ -43,15 +59,56 @@ src_points = np.float32([
     [408, 1071]   # Bottom-Left
 ])
 
+# Calibration outline as int32 for polylines, drawn every frame
+SRC_POINTS_I32 = np.int32(src_points)
+
 dst_points = np.float32([
     [0, 0], [MAP_WIDTH, 0], [MAP_WIDTH, MAP_HEIGHT], [0, MAP_HEIGHT]
 ])
 matrix = cv2.getPerspectiveTransform(src_points, dst_points)
 
 # --- PATIENT DATABASE ---
-# Stores { global_id : feature_vector (numpy array) }
-patient_db = {}  
+# Stores { global_id : feature_vector (numpy array) }, least recently seen first.
+# Capped at MAX_PATIENTS so the search matrix stays small over a long shift
+patient_db = OrderedDict()
 next_global_id = 1
+MAX_PATIENTS = 256
+
+# Maintained alongside patient_db: L2-normalized rows, one per global id, so a
+# lookup is one matrix-vector product. Rows are stored as int8 (x127; values of a
+# unit vector lie in [-1, 1]), a quarter of the float32 size. Capacity doubles when full
+DB_SCALE = 127
+db_ids, db_rows = [], {}  # row order; global_id -> row
+db_matrix = np.empty((16, 512), dtype=np.int8)
+
+def quantize(vector):
+    """L2-normalize and round to int8."""
+    return np.round(vector * (DB_SCALE / (np.linalg.norm(vector) + 1e-9))).astype(np.int8)
+
+def set_patient_vector(global_id, vector):
+    """Stores a patient's vector and its normalized row in db_matrix."""
+    global db_matrix
+    patient_db[global_id] = vector
+    row = db_rows.get(global_id)
+    if row is None:
+        row = len(db_ids)
+        if row == len(db_matrix):
+            db_matrix = np.concatenate([db_matrix, np.empty_like(db_matrix)])
+        db_rows[global_id] = row; db_ids.append(global_id)
+    db_matrix[row] = quantize(vector)
+    patient_db.move_to_end(global_id)
+    if len(patient_db) > MAX_PATIENTS:
+        evict_oldest_patient()
+
+def evict_oldest_patient():
+    """Drops the least recently seen patient; the last row moves into its slot."""
+    global_id, _ = patient_db.popitem(last=False)
+    row, last = db_rows.pop(global_id), len(db_ids) - 1
+    if row != last:
+        moved = db_ids[last]
+        db_matrix[row] = db_matrix[last]
+        db_ids[row] = moved; db_rows[moved] = row
+    db_ids.pop()
 
 # Similarity Threshold (Cosine Distance)
 # Lower distance = More similar. 
@@ -61,44 +118,51 @@ MATCH_THRESHOLD = 0.20
 # If it thinks two different people are the same person: LOWER the number (e.g., 0.20 or 0.15). This makes the model stricter.
 # If it thinks the same person is a new patient: RAISE the number (e.g., 0.30). This makes the model more lenient.
 
-def get_embedding(image_crop):
+def get_embeddings(image_crops):
     """
-    Feeds the image crop into the Neural Network to get a 512-dim vector.
+    Feeds all crops of a frame through the Neural Network in one batch.
+    Returns a (K, 512) array, one vector per crop.
     """
-    # 1. Preprocess (Resize, Normalize)
-    img_tensor = preprocess(image_crop).unsqueeze(0).to(device)
+    # 1. Preprocess (Resize, Normalize), stacked and uploaded once
+    batch = preprocess(image_crops).to(device, dtype=model_dtype, non_blocking=True)
     
-    # 2. Run Inference
-    with torch.no_grad():
-        features = feature_extractor(img_tensor)
+    # 2. Run Inference (one forward pass for everyone)
+    with torch.inference_mode():
+        features = feature_extractor(batch)
     
-    # 3. Flatten to a simple list of numbers
-    return features.cpu().numpy().flatten()
+    # 3. Flatten to simple lists of numbers (FP32 for the cosine math)
+    return features.flatten(1).float().cpu().numpy()
+
+def get_embedding(image_crop):
+    """
+    Feeds the image crop into the Neural Network to get a 512-dim vector.
+    """
+    return get_embeddings([image_crop])[0]
 
-def identify_patient(image_crop):
+def identify_patient(curr_vector):
     """
-    Compares the current person's vector against the database using Cosine Similarity.
+    Compares the current person's vector (from get_embedding) against the
+    database using Cosine Similarity.
     """
     global next_global_id
     
-    # Get current vector
-    curr_vector = get_embedding(image_crop)
-    
     best_match_id = None
     lowest_dist = 1.0 # 1.0 means completely different
     
-    for pid, saved_vector in patient_db.items():
-        # Calculate Cosine Distance
-        dist = cosine(curr_vector, saved_vector)
-        
-        if dist < lowest_dist:
-            lowest_dist = dist
-            best_match_id = pid
+    if db_ids:
+        # Cosine Distance to every patient at once (int8 products, int32 sums)
+        curr = quantize(curr_vector)
+        sims = np.einsum('ij,j->i', db_matrix[:len(db_ids)], curr, dtype=np.int32) / (DB_SCALE * DB_SCALE)
+        best = int(sims.argmax())
+        if 1.0 - sims[best] < lowest_dist:
+            lowest_dist = 1.0 - sims[best]
+            best_match_id = db_ids[best]
             
     # DEBUG: See the math in real-time
     # print(f"Best Match: P{best_match_id} | Distance: {lowest_dist:.4f}")
 
     if lowest_dist < MATCH_THRESHOLD:
+        patient_db.move_to_end(best_match_id)
         return best_match_id, True, curr_vector
     else:
         # Create New Patient
@@ -116,76 +180,136 @@ cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 1080)
 
 print("Starting Camera... Allow permissions if asked.")
 
-while True:
-    ret, frame = cap.read()
-    if not ret: break
-    
-    display_map = map_img.copy()
-    cv2.rectangle(display_map, (0,0), (MAP_WIDTH, MAP_HEIGHT), (255, 255, 255), -1)
-    
-    # Draw the yellow floor zone so you know where to stand
-    cv2.polylines(frame, [np.int32(src_points)], True, (0, 255, 255), 2)
+# Frames are tracked BATCH at a time: one YOLO call per batch, then each
+# frame is drawn and shown in order. ultralytics>=8.3 runs a list batch through
+# one tracker in order (8.0.x kept a tracker per batch index, so IDs flipped)
+BATCH = 4
+frame_buf = []
+quit_requested = False
 
-    # Run YOLO
-    results = yolo_model.track(frame, persist=True, classes=[0], verbose=False)
+# Known tracks are re-fingerprinted for the adaptive update only every Nth frame;
+# new track IDs are still identified on the frame they appear
+REID_UPDATE_INTERVAL = 15
+frame_idx = 0
 
-    if results[0].boxes.id is not None:
-        boxes = results[0].boxes.xyxy.cpu().numpy()
-        track_ids = results[0].boxes.id.int().cpu().numpy()
+# Capture runs in its own thread so reading the camera overlaps with YOLO.
+# The queue holds one batch; when inference falls behind the oldest frame is dropped.
+frame_queue = queue.Queue(maxsize=BATCH)  # None = camera ended
+stop_event = threading.Event()
 
-        for box, track_id in zip(boxes, track_ids):
-            x1, y1, x2, y2 = map(int, box)
-            
-            # Extract Crop
+def put_latest(q, item):
+    """Non-blocking put; drops the oldest queued item when full"""
+    try:
+        q.put_nowait(item)
+    except queue.Full:
+        try: q.get_nowait()
+        except queue.Empty: pass
+        q.put_nowait(item)
+
+def capture_loop():
+    # Every frame is queued; put_latest evicts the stalest one when full, so
+    # inference always gets the newest BATCH frames
+    while not stop_event.is_set():
+        if not cap.grab():
+            put_latest(frame_queue, None); break
+        ret, frame = cap.retrieve()
+        if ret:
+            put_latest(frame_queue, frame)
+
+capture_thread = threading.Thread(target=capture_loop, daemon=True)
+capture_thread.start()
+
+while not quit_requested:
+    frame = frame_queue.get()
+    if frame is None: break
+    frame_buf.append(frame)
+    if len(frame_buf) < BATCH:
+        continue
+
+    results_list = yolo_model.track(frame_buf, persist=True, classes=[0], verbose=False) # class 0 is Person
+    for frame, result in zip(frame_buf, results_list):
+        run_update = frame_idx % REID_UPDATE_INTERVAL == 0
+        frame_idx += 1
+
+        np.copyto(display_map, blank_map)
+    
+        # Draw the yellow floor zone so you know where to stand
+        cv2.polylines(frame, [SRC_POINTS_I32], True, (0, 255, 255), 2)
+
+        if result.boxes.id is not None:
+            # One device->host copy for boxes and IDs (tracked rows: x1, y1, x2, y2, id, conf, cls)
+            det = result.boxes.data.cpu().numpy()
+            boxes = det[:, :4].astype(np.int32)
+            track_ids = det[:, 4].astype(np.int32).tolist()
+            # Clip to the frame in place so crops need no per-person max/min
             h, w, _ = frame.shape
-            face_crop = frame[max(0,y1):min(h,y2), max(0,x1):min(w,x2)]
-            
-            if face_crop.size > 0:
-                # Identification Logic
-                if track_id not in active_track_map:
-                    # NEW PERSON (to YOLO) -> Check Database
-                    global_id, is_returning, vector = identify_patient(face_crop)
-                    active_track_map[track_id] = global_id
+            np.clip(boxes[:, 0::2], 0, w, out=boxes[:, 0::2])
+            np.clip(boxes[:, 1::2], 0, h, out=boxes[:, 1::2])
+            box_list = boxes.tolist()
+
+            # Extract every crop that needs an embedding first (unmapped tracks, or
+            # everyone on an update frame), then one batched ResNet pass for all of them
+            crops, crop_idx = [], []
+            for i, ((x1, y1, x2, y2), track_id) in enumerate(zip(box_list, track_ids)):
+                if track_id in active_track_map and not run_update:
+                    continue
+                face_crop = frame[y1:y2, x1:x2]
+                if face_crop.size > 0:
+                    crops.append(face_crop); crop_idx.append(i)
+            vectors = dict(zip(crop_idx, get_embeddings(crops))) if crops else {}
+
+            # Feet (bottom centre of each box) -> map coordinates, one transform for everyone
+            feet = np.stack([(boxes[:, 0] + boxes[:, 2]) * 0.5, boxes[:, 3]], axis=1).astype(np.float32)
+            map_pts = cv2.perspectiveTransform(feet.reshape(-1, 1, 2), matrix).reshape(-1, 2).astype(np.int32).tolist()
+
+            for i, ((x1, y1, x2, y2), track_id, (map_x, map_y)) in enumerate(zip(box_list, track_ids, map_pts)):
+                # The same vector is used for identification and for the adaptive update below
+                curr_vector = vectors.get(i)
+                if curr_vector is not None:
+                    # Identification Logic
+                    if track_id not in active_track_map:
+                        # NEW PERSON (to YOLO) -> Check Database
+                        global_id, is_returning, vector = identify_patient(curr_vector)
+                        active_track_map[track_id] = global_id
                     
-                    if is_returning:
-                        print(f"ML MATCH: Patient {global_id} returned!")
-                    else:
-                        # New patient, save their vector
-                        patient_db[global_id] = vector
+                        if is_returning:
+                            print(f"ML MATCH: Patient {global_id} returned!")
+                        else:
+                            # New patient, save their vector
+                            set_patient_vector(global_id, vector)
                 
-                # ADAPTIVE UPDATE (Upgrade 2 logic applied to ML)
-                # If the person is clearly visible, update their vector slightly
-                # so the model adapts to lighting changes.
-                current_global_id = active_track_map[track_id]
-                # We blend the new vector with the old one (Running Average)
-                # This keeps the ID stable but adaptable.
-                new_vector = get_embedding(face_crop)
-                patient_db[current_global_id] = (0.9 * patient_db[current_global_id]) + (0.1 * new_vector)
-
-            # --- DRAWING ---
-            global_display_id = active_track_map.get(track_id, "?")
+                    # ADAPTIVE UPDATE (Upgrade 2 logic applied to ML)
+                    # If the person is clearly visible, update their vector slightly
+                    # so the model adapts to lighting changes.
+                    current_global_id = active_track_map[track_id]
+                    # We blend the new vector with the old one (Running Average)
+                    # This keeps the ID stable but adaptable.
+                    # (a patient evicted from the capped DB restarts from this view)
+                    prev_vector = patient_db.get(current_global_id, curr_vector)
+                    set_patient_vector(current_global_id, (0.9 * prev_vector) + (0.1 * curr_vector))
+
+                # --- DRAWING ---
+                global_display_id = active_track_map.get(track_id, "?")
             
-            # Map Logic
-            foot_x, foot_y = int((x1 + x2) / 2), int(y2)
-            p = np.array([[[foot_x, foot_y]]], dtype=np.float32)
-            transformed = cv2.perspectiveTransform(p, matrix)
-            map_x, map_y = int(transformed[0][0][0]), int(transformed[0][0][1])
-
-            # Draw
-            cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-            cv2.putText(frame, f"P{global_display_id}", (x1, y1 - 10), 
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
+                # Draw
+                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+                cv2.putText(frame, f"P{global_display_id}", (x1, y1 - 10), 
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
             
-            if 0 <= map_x < MAP_WIDTH and 0 <= map_y < MAP_HEIGHT:
-                cv2.circle(display_map, (map_x, map_y), 15, (255, 0, 0), -1)
-                cv2.putText(display_map, f"P{global_display_id}", (map_x+20, map_y), 
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 0), 2)
+                if 0 <= map_x < MAP_WIDTH and 0 <= map_y < MAP_HEIGHT:
+                    cv2.circle(display_map, (map_x, map_y), 15, (255, 0, 0), -1)
+                    cv2.putText(display_map, f"P{global_display_id}", (map_x+20, map_y), 
+                                cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 0), 2)
 
-    cv2.imshow("ML Patient Tracking", frame)
-    cv2.imshow("Map", display_map)
+        cv2.imshow("ML Patient Tracking", frame)
+        cv2.imshow("Map", display_map)
 
-    if cv2.waitKey(1) & 0xFF == ord('q'):
-        break
+        if cv2.waitKey(1) & 0xFF == ord('q'):
+            quit_requested = True
+            break
+    frame_buf = []
 
+stop_event.set()
+capture_thread.join()
 cap.release()
 cv2.destroyAllWindows()
\ No newline at end of file
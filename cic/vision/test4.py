@@ -7,14 +7,20 @@ import torchvision.models as models
 from scipy.spatial.distance import cosine
 
 # --- SYSTEM SETUP ---
-device = torch.device("mps") if torch.backends.mps.is_available() else torch.device("cpu")
+if torch.cuda.is_available():
+    device = torch.device("cuda")
+elif torch.backends.mps.is_available():
+    device = torch.device("mps")
+else:
+    device = torch.device("cpu")
 print(f"Running Neural Network on: {device}")
 
 # --- AI MODEL FOR RE-ID (ResNet) ---
 feature_extractor = models.resnet18(weights=models.ResNet18_Weights.IMAGENET1K_V1)
 feature_extractor = torch.nn.Sequential(*(list(feature_extractor.children())[:-1]))
-feature_extractor.to(device)
-feature_extractor.eval()
+# FP16 on GPU (MPS/CUDA) halves memory traffic; CPU stays FP32
+model_dtype = torch.float32 if device.type == "cpu" else torch.float16
+feature_extractor = feature_extractor.to(device, dtype=model_dtype).eval()
 
 preprocess = T.Compose([
     T.ToPILImage(),
@@ -27,7 +33,9 @@ preprocess = T.Compose([
 yolo_model = YOLO('yolov8n.pt') 
 
 MAP_WIDTH, MAP_HEIGHT = 600, 600
-map_img = np.zeros((MAP_HEIGHT, MAP_WIDTH, 3), dtype=np.uint8)
+# White map background, built once; each frame restores it with one copy
+blank_map = np.full((MAP_HEIGHT, MAP_WIDTH, 3), 255, dtype=np.uint8)
+display_map = blank_map.copy()
 
 # --- CALIBRATION (1920x1080) ---
 src_points = np.float32([
@@ -37,6 +45,9 @@ src_points = np.float32([
     [216, 1068]   # Bottom-Left
 ])
 
+# Calibration outline as int32 for polylines, drawn every frame
+SRC_POINTS_I32 = np.int32(src_points)
+
 # CHANGE: Mirrored the X-coordinates compared to the previous version
 # This ensures Left on Camera = Left on Map
 dst_points = np.float32([
@@ -56,14 +67,48 @@ MATCH_THRESHOLD = 0.20
 # If it thinks the same person is a new patient: RAISE the number (e.g., 0.30). This makes the model more lenient.
 
 def get_embedding(image_crop):
-    img_tensor = preprocess(image_crop).unsqueeze(0).to(device)
-    with torch.no_grad():
+    img_tensor = preprocess(image_crop).unsqueeze(0).to(device, dtype=model_dtype)
+    with torch.inference_mode():
         features = feature_extractor(img_tensor)
-    return features.cpu().numpy().flatten()
-
-def identify_patient(image_crop):
+    # Cosine math stays in FP32
+    return features.float().cpu().numpy().flatten()
+
+# CUDA: crops are staged in pinned host memory and run on a side stream so the
+# copies are asynchronous. Other devices just batch the crops.
+MAX_BATCH = 16
+if device.type == "cuda":
+    pinned = torch.empty((MAX_BATCH, 3, 224, 224), dtype=torch.float32).pin_memory()
+    reid_stream = torch.cuda.Stream()
+
+def get_embeddings(image_crops):
+    """Embed a list of crops in batches of MAX_BATCH. Returns an (N, 512) array."""
+    vectors = []
+    for start in range(0, len(image_crops), MAX_BATCH):
+        chunk = image_crops[start:start + MAX_BATCH]
+        n = len(chunk)
+
+        if device.type == "cuda":
+            for i, crop in enumerate(chunk):
+                pinned[i].copy_(preprocess(crop))
+            with torch.cuda.stream(reid_stream):
+                batch = pinned[:n].to(device, non_blocking=True).to(model_dtype)
+                with torch.inference_mode():
+                    features = feature_extractor(batch)
+                features = features.float().to("cpu", non_blocking=True)
+            # Only wait once the CPU needs the vectors
+            reid_stream.synchronize()
+        else:
+            batch = torch.stack([preprocess(crop) for crop in chunk]).to(device, dtype=model_dtype)
+            with torch.inference_mode():
+                features = feature_extractor(batch).float().cpu()
+
+        vectors.append(features.numpy().reshape(n, -1))
+    return np.concatenate(vectors) if vectors else np.empty((0, 512), dtype=np.float32)
+
+def identify_patient(image_crop, curr_vector=None):
     global next_global_id
-    curr_vector = get_embedding(image_crop)
+    if curr_vector is None:
+        curr_vector = get_embedding(image_crop)
     best_match_id = None
     lowest_dist = 1.0 
     
@@ -82,6 +127,17 @@ def identify_patient(image_crop):
 
 active_track_map = {}
 
+# --- INFERENCE CADENCE ---
+# People move only a few pixels per frame at 30 FPS, so YOLO runs every Nth
+# frame and the last boxes are reused in between. New track IDs are always
+# identified straight away; the adaptive embedding update runs less often.
+DETECT_EVERY_N = 2
+REID_EVERY_N = 15
+
+frame_idx = 0
+last_reid_frame = -REID_EVERY_N
+last_tracks = None  # (boxes, track_ids, map_pts) from the last YOLO pass
+
 # --- MAIN LOOP ---
 cap = cv2.VideoCapture(0)
 cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1920)
@@ -96,47 +152,70 @@ while True:
     # 1. Mirror the Camera Feed
     frame = cv2.flip(frame, 1)
     
-    display_map = map_img.copy()
-    cv2.rectangle(display_map, (0,0), (MAP_WIDTH, MAP_HEIGHT), (255, 255, 255), -1)
+    np.copyto(display_map, blank_map)
     
     # Draw floor zone (visualization)
-    cv2.polylines(frame, [np.int32(src_points)], True, (0, 255, 255), 2)
+    cv2.polylines(frame, [SRC_POINTS_I32], True, (0, 255, 255), 2)
 
-    results = yolo_model.track(frame, persist=True, classes=[0], verbose=False)
+    run_detection = frame_idx % DETECT_EVERY_N == 0
+    run_reid_update = run_detection and frame_idx - last_reid_frame >= REID_EVERY_N
+    if run_reid_update:
+        last_reid_frame = frame_idx
+    frame_idx += 1
 
-    if results[0].boxes.id is not None:
-        boxes = results[0].boxes.xyxy.cpu().numpy()
-        track_ids = results[0].boxes.id.int().cpu().numpy()
+    if run_detection:
+        results = yolo_model.track(frame, persist=True, classes=[0], verbose=False)
+        last_tracks = None
 
-        for box, track_id in zip(boxes, track_ids):
-            x1, y1, x2, y2 = map(int, box)
-            
-            # Extract Crop
+        if results[0].boxes.id is not None:
+            boxes = results[0].boxes.xyxy.cpu().numpy()
+            track_ids = results[0].boxes.id.int().cpu().numpy()
+
+            # Map Logic: project every foot point (bottom-centre) in one call
+            boxes_i = boxes.astype(np.int32)
+            foot_pts = np.stack([(boxes_i[:, 0] + boxes_i[:, 2]) // 2, boxes_i[:, 3]], axis=1)
+            foot_pts = foot_pts.astype(np.float32).reshape(-1, 1, 2)
+            map_pts = cv2.perspectiveTransform(foot_pts, matrix).reshape(-1, 2).astype(np.int32)
+
+            last_tracks = (boxes, track_ids, map_pts)
+
+    if last_tracks is not None:
+        boxes, track_ids, map_pts = last_tracks
+
+        # Re-ID only on fresh boxes (skipped frames reuse the last ones)
+        if run_detection:
+            # Collect the crops that need an embedding, then run them as one batch
             h, w, _ = frame.shape
-            face_crop = frame[max(0,y1):min(h,y2), max(0,x1):min(w,x2)]
-            
-            if face_crop.size > 0:
+            pending_ids, pending_crops = [], []
+            for box, track_id in zip(boxes, track_ids):
+                if track_id in active_track_map and not run_reid_update:
+                    continue
+                x1, y1, x2, y2 = map(int, box)
+                face_crop = frame[max(0,y1):min(h,y2), max(0,x1):min(w,x2)]
+                if face_crop.size > 0:
+                    pending_ids.append(track_id)
+                    pending_crops.append(face_crop)
+
+            for track_id, vector in zip(pending_ids, get_embeddings(pending_crops)):
                 if track_id not in active_track_map:
-                    global_id, is_returning, vector = identify_patient(face_crop)
+                    global_id, is_returning, vector = identify_patient(None, vector)
                     active_track_map[track_id] = global_id
                     if is_returning:
                         print(f"ML MATCH: Patient {global_id} returned!")
                     else:
                         patient_db[global_id] = vector
-                
+
                 # Adaptive Update
-                current_global_id = active_track_map[track_id]
-                new_vector = get_embedding(face_crop)
-                patient_db[current_global_id] = (0.9 * patient_db[current_global_id]) + (0.1 * new_vector)
+                else:
+                    current_global_id = active_track_map[track_id]
+                    patient_db[current_global_id] = (0.9 * patient_db[current_global_id]) + (0.1 * vector)
+
+        for box, track_id, (map_x, map_y) in zip(boxes, track_ids, map_pts):
+            x1, y1, x2, y2 = map(int, box)
 
             # --- DRAWING ---
             global_display_id = active_track_map.get(track_id, "?")
-            
-            # Map Logic
-            foot_x, foot_y = int((x1 + x2) / 2), int(y2)
-            p = np.array([[[foot_x, foot_y]]], dtype=np.float32)
-            transformed = cv2.perspectiveTransform(p, matrix)
-            map_x, map_y = int(transformed[0][0][0]), int(transformed[0][0][1])
+            map_x, map_y = int(map_x), int(map_y)
 
             # Draw on Camera
             cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
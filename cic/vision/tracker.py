@@ -2,6 +2,9 @@
 Centroid Tracker
 ================
 Assigns persistent IDs to detected people across frames.
+
+YoloNativeTracker wraps the IDs from YOLO's built-in tracker and is the
+default; CentroidTracker is kept as a fallback for untracked detections.
 """
 
 from typing import Dict, List, Tuple, Optional
@@ -45,6 +48,7 @@ class CentroidTracker:
             max_missed: Frames before removing lost track
         """
         self.max_distance = max_distance
+        self._max_distance_sq = max_distance * max_distance
         self.max_missed = max_missed
         self.next_id = 1
         self.tracks: OrderedDict[str, TrackedPerson] = OrderedDict()
@@ -78,7 +82,7 @@ class CentroidTracker:
         track_ids = list(self.tracks.keys())
         track_centroids = np.array([self.tracks[tid].centroid for tid in track_ids])
 
-        # Compute distance matrix
+        # Compute squared distance matrix (same ordering, no sqrt)
         distances = self._compute_distances(track_centroids, input_centroids)
 
         # Greedy matching: match closest pairs first
@@ -86,7 +90,7 @@ class CentroidTracker:
         used_tracks = set()
 
         # Sort by distance
-        rows, cols = np.where(distances < self.max_distance)
+        rows, cols = np.where(distances < self._max_distance_sq)
         if len(rows) > 0:
             sorted_indices = np.argsort(distances[rows, cols])
 
@@ -136,11 +140,11 @@ class CentroidTracker:
         return track_id
 
     def _compute_distances(self, tracks: np.ndarray, detections: np.ndarray) -> np.ndarray:
-        """Compute Euclidean distance matrix."""
+        """Compute squared Euclidean distance matrix."""
         # tracks: (N, 2), detections: (M, 2)
-        # output: (N, M) distance matrix
+        # output: (N, M) squared distance matrix
         diff = tracks[:, np.newaxis, :] - detections[np.newaxis, :, :]
-        return np.sqrt(np.sum(diff ** 2, axis=2))
+        return np.einsum('nmk,nmk->nm', diff, diff)
 
     def get_track(self, track_id: str) -> Optional[TrackedPerson]:
         """Get a specific track by ID."""
@@ -150,3 +154,64 @@ class CentroidTracker:
         """Clear all tracks."""
         self.tracks.clear()
         self.next_id = 1
+
+
+class YoloNativeTracker:
+    """
+    Tracker backed by YOLO's integrated BoT-SORT/ByteTrack IDs.
+
+    Use with PersonDetector(use_tracker=True). No distance matrix is built;
+    this only keeps TrackedPerson state and missed-frame counts per YOLO ID.
+    """
+
+    def __init__(self, max_missed: int = 15):
+        """
+        Args:
+            max_missed: Frames before removing lost track
+        """
+        self.max_missed = max_missed
+        self.tracks: OrderedDict[str, TrackedPerson] = OrderedDict()
+
+    def update(self, detections: List[Detection]) -> Dict[str, TrackedPerson]:
+        """
+        Update tracks with new detections.
+
+        Detections without a YOLO track ID are ignored.
+
+        Returns:
+            Dict of track_id -> TrackedPerson
+        """
+        seen = set()
+
+        for det in detections:
+            if det.track_id is None:
+                continue
+
+            track_id = f"T-{det.track_id:04d}"
+            seen.add(track_id)
+
+            if track_id in self.tracks:
+                self.tracks[track_id].update(det.center, det.bbox)
+            else:
+                self.tracks[track_id] = TrackedPerson(
+                    track_id=track_id,
+                    centroid=det.center,
+                    bbox=det.bbox
+                )
+
+        # Increment missed for IDs YOLO did not report this frame
+        for track_id in list(self.tracks.keys()):
+            if track_id not in seen:
+                self.tracks[track_id].missed_frames += 1
+                if self.tracks[track_id].missed_frames > self.max_missed:
+                    del self.tracks[track_id]
+
+        return dict(self.tracks)
+
+    def get_track(self, track_id: str) -> Optional[TrackedPerson]:
+        """Get a specific track by ID."""
+        return self.tracks.get(track_id)
+
+    def clear(self):
+        """Clear all tracks."""
+        self.tracks.clear()
@@ -1,6 +1,18 @@
 import cv2
 import numpy as np
-from typing import Tuple, Optional
+from typing import Dict, Tuple, Optional
+
+try:
+    import faiss
+    FAISS_AVAILABLE = True
+except ImportError:
+    FAISS_AVAILABLE = False
+
+# OpenCV built with CUDA (the stock pip wheels are not): warp and blend on the GPU
+try:
+    CUDA_AVAILABLE = cv2.cuda.getCudaEnabledDeviceCount() > 0
+except (AttributeError, cv2.error):
+    CUDA_AVAILABLE = False
 
 class ImageStitcher:
     def __init__(self, min_matches: int = 10, ransac_threshold: float = 4.0):
@@ -14,6 +26,18 @@ class ImageStitcher:
         self.min_matches = min_matches
         self.ransac_threshold = ransac_threshold
         self.orb = cv2.ORB_create(nfeatures=5000)
+        # FAST + BRIEF on the GPU when available; the CPU detector stays as fallback
+        self.gpu_orb = cv2.cuda_ORB.create(nfeatures=5000) if CUDA_AVAILABLE else None
+        self.bf = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=False)
+        # Reused warp output (internal only; the stitched canvas is always new)
+        self._warp_buf: Optional[np.ndarray] = None
+        # Fixed-point remap tables per (homography, canvas size). Only worth it
+        # when the exact same H recurs (a caller stitching video with a pinned,
+        # calibrated H); RANSAC output from process() differs every call, so
+        # maps are built on the second use of a key and misses use warpPerspective
+        self._map_cache: Dict[bytes, Tuple[np.ndarray, np.ndarray]] = {}
+        self._map_cache_size = 8
+        self._last_warp_key: Optional[bytes] = None
     
     def find_features(self, image: np.ndarray) -> Tuple[list, np.ndarray]:
         """Detect and compute ORB features in the image."""
@@ -22,13 +46,25 @@ class ImageStitcher:
             gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
         else:
             gray = image
+        if self.gpu_orb is not None:
+            try:
+                gpu_gray = cv2.cuda_GpuMat()
+                gpu_gray.upload(gray)
+                gpu_kp, gpu_desc = self.gpu_orb.detectAndComputeAsync(gpu_gray, None)
+                keypoints = self.gpu_orb.convert(gpu_kp)
+                descriptors = gpu_desc.download() if keypoints else None
+                return keypoints, descriptors
+            except cv2.error:
+                pass  # e.g. image too small for the GPU pyramid: use the CPU detector
         keypoints, descriptors = self.orb.detectAndCompute(gray, None)
         return keypoints, descriptors
     
     def match_features(self, desc1: np.ndarray, desc2: np.ndarray) -> list:
-        """Match features between two images using BFMatcher."""
-        bf = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=False)
-        matches = bf.knnMatch(desc1, desc2, k=2)
+        """Match features between two images using FAISS (if installed) or BFMatcher."""
+        if FAISS_AVAILABLE:
+            return self._match_features_faiss(desc1, desc2)
+        
+        matches = self.bf.knnMatch(desc1, desc2, k=2)
         
         # Apply Lowe's ratio test to filter good matches
         good_matches = []
@@ -40,8 +76,19 @@ class ImageStitcher:
         
         return good_matches
     
+    def _match_features_faiss(self, desc1: np.ndarray, desc2: np.ndarray) -> list:
+        """2-NN Hamming search with FAISS's popcount kernels, then the same ratio test."""
+        index = faiss.IndexBinaryFlat(desc2.shape[1] * 8)
+        index.add(desc2)
+        D, I = index.search(desc1, 2)
+        
+        # Lowe's ratio test, vectorized (I == -1 when desc2 has fewer than 2 rows)
+        good = (I[:, 1] >= 0) & (D[:, 0] < 0.75 * D[:, 1])
+        return [cv2.DMatch(q, t, float(d))
+                for q, t, d in zip(np.flatnonzero(good).tolist(), I[good, 0].tolist(), D[good, 0].tolist())]
+    
     def verify_overlap(self, img1: np.ndarray, img2: np.ndarray, 
-                       kp1: list, kp2: list, matches: list) -> Tuple[bool, Optional[np.ndarray]]:
+                       kp1: list, kp2: list, matches: list) -> Tuple[bool, Optional[np.ndarray], Optional[np.ndarray]]:
         """
         Verify if two images have a valid overlapping region.
         
@@ -51,10 +98,11 @@ class ImageStitcher:
             matches: Feature matches between images
         
         Returns:
-            (is_overlap, homography_matrix)
+            (is_overlap, homography_matrix, inlier_mask)
+            The RANSAC inlier mask is returned so the quality score can reuse it.
         """
         if len(matches) < self.min_matches:
-            return False, None
+            return False, None, None
         
         # Extract matched points
         src_pts = np.float32([kp1[m.queryIdx].pt for m in matches]).reshape(-1, 1, 2)
@@ -64,7 +112,7 @@ class ImageStitcher:
         H, mask = cv2.findHomography(src_pts, dst_pts, cv2.RANSAC, self.ransac_threshold)
         
         if H is None:
-            return False, None
+            return False, None, None
         
         # Check if homography is valid (not too much distortion)
         inlier_count = np.sum(mask)
@@ -72,7 +120,29 @@ class ImageStitcher:
         
         is_valid = inlier_ratio > 0.3 and inlier_count >= self.min_matches
         
-        return is_valid, H if is_valid else None
+        return is_valid, H if is_valid else None, mask
+    
+    def _warp_maps(self, H: np.ndarray, width: int,
+                   height: int) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Remap tables equivalent to warpPerspective(img, H, (width, height)),
+        or None if this H has not been seen twice in a row yet.
+        
+        With identity camera matrices and no distortion, initUndistortRectifyMap
+        maps each output pixel through inv(H), i.e. the same inverse warp.
+        """
+        key = H.astype(np.float64).tobytes() + np.int32([width, height]).tobytes()
+        maps = self._map_cache.get(key)
+        if maps is None:
+            if key != self._last_warp_key:
+                self._last_warp_key = key
+                return None  # One-off homography: a plain warp is cheaper
+            if len(self._map_cache) >= self._map_cache_size:
+                self._map_cache.clear()  # Homography changed: drop stale maps
+            eye = np.eye(3)
+            maps = cv2.initUndistortRectifyMap(eye, None, H, eye, (width, height), cv2.CV_16SC2)
+            self._map_cache[key] = maps
+        return maps
     
     def stitch_images(self, img1: np.ndarray, img2: np.ndarray, 
                      H: np.ndarray) -> np.ndarray:
@@ -109,51 +179,101 @@ class ImageStitcher:
         H_adjusted[0, 2] -= x_min
         H_adjusted[1, 2] -= y_min
         
-        # Warp img1 with adjusted homography
-        warped_img1 = cv2.warpPerspective(img1, H_adjusted, (canvas_width, canvas_height))
+        y2_offset = int(-y_min)
+        x2_offset = int(-x_min)
+        
+        if CUDA_AVAILABLE and img1.ndim == 3:
+            try:
+                return self._stitch_gpu(img1, img2, H_adjusted, canvas_width, canvas_height,
+                                        x2_offset, y2_offset)
+            except cv2.error:
+                pass  # Unsupported type/size on this build: fall back to the CPU path
+        
+        # Warp img1 with adjusted homography into the preallocated buffer
+        # (every pixel is written, border included, so no clearing is needed)
+        warp_shape = (canvas_height, canvas_width) + img1.shape[2:]
+        if self._warp_buf is None or self._warp_buf.shape != warp_shape or self._warp_buf.dtype != img1.dtype:
+            self._warp_buf = np.empty(warp_shape, dtype=img1.dtype)
+        maps = self._warp_maps(H_adjusted, canvas_width, canvas_height)
+        if maps is not None:
+            warped_img1 = cv2.remap(img1, maps[0], maps[1], cv2.INTER_LINEAR, dst=self._warp_buf)
+        else:
+            warped_img1 = cv2.warpPerspective(img1, H_adjusted, (canvas_width, canvas_height), dst=self._warp_buf)
         
         # Create output canvas with black background
         stitched = np.zeros((canvas_height, canvas_width, 3), dtype=np.uint8)
         
         # Place img2 at correct offset
-        y2_offset = int(-y_min)
-        x2_offset = int(-x_min)
         stitched[y2_offset:y2_offset+h2, x2_offset:x2_offset+w2] = img2
         
-        # Blend overlapping region
-        mask_warped = (warped_img1 != 0).any(axis=2)
-        mask_stitched = (stitched != 0).any(axis=2)
-        overlap_mask = mask_stitched & mask_warped
+        # Single-channel uint8 "pixel present" masks
+        _, mask_warped = cv2.threshold(cv2.cvtColor(warped_img1, cv2.COLOR_BGR2GRAY), 0, 255, cv2.THRESH_BINARY)
+        _, mask_stitched = cv2.threshold(cv2.cvtColor(stitched, cv2.COLOR_BGR2GRAY), 0, 255, cv2.THRESH_BINARY)
+        overlap_mask = cv2.bitwise_and(mask_warped, mask_stitched)
+        no_overlap = cv2.bitwise_and(mask_warped, cv2.bitwise_not(mask_stitched))
         
-        # Blend where both images exist
-        if np.any(overlap_mask):
-            stitched[overlap_mask] = cv2.addWeighted(stitched[overlap_mask], 0.5, warped_img1[overlap_mask], 0.5, 0)
+        # Blend whole images once, then copy it in where both images exist
+        blend = cv2.addWeighted(stitched, 0.5, warped_img1, 0.5, 0)
+        cv2.copyTo(blend, overlap_mask, stitched)
         
         # Place warped image where only it exists
-        no_overlap = mask_warped & ~mask_stitched
-        if np.any(no_overlap):
-            stitched[no_overlap] = warped_img1[no_overlap]
+        cv2.copyTo(warped_img1, no_overlap, stitched)
         
         # Non-overlapping regions remain black (already initialized to 0)
         
         return stitched
     
+    def _stitch_gpu(self, img1: np.ndarray, img2: np.ndarray, H_adjusted: np.ndarray,
+                    canvas_width: int, canvas_height: int,
+                    x2_offset: int, y2_offset: int) -> np.ndarray:
+        """
+        Same warp and blend as stitch_images, on the GPU.
+        Only the final stitched frame is downloaded.
+        """
+        h2, w2 = img2.shape[:2]
+        
+        gpu_img1 = cv2.cuda_GpuMat()
+        gpu_img1.upload(img1)
+        warped = cv2.cuda.warpPerspective(gpu_img1, H_adjusted, (canvas_width, canvas_height))
+        
+        # img2 on a black canvas of the same size
+        canvas = np.zeros((canvas_height, canvas_width, 3), dtype=np.uint8)
+        canvas[y2_offset:y2_offset+h2, x2_offset:x2_offset+w2] = img2
+        stitched = cv2.cuda_GpuMat()
+        stitched.upload(canvas)
+        
+        # Single-channel "pixel present" masks
+        _, mask_warped = cv2.cuda.threshold(cv2.cuda.cvtColor(warped, cv2.COLOR_BGR2GRAY), 0, 255, cv2.THRESH_BINARY)
+        _, mask_stitched = cv2.cuda.threshold(cv2.cuda.cvtColor(stitched, cv2.COLOR_BGR2GRAY), 0, 255, cv2.THRESH_BINARY)
+        overlap_mask = cv2.cuda.bitwise_and(mask_warped, mask_stitched)
+        no_overlap = cv2.cuda.bitwise_and(mask_warped, cv2.cuda.bitwise_not(mask_stitched))
+        
+        # 50/50 blend where both exist, warped img1 where only it exists
+        blend = cv2.cuda.addWeighted(stitched, 0.5, warped, 0.5, 0)
+        blend.copyTo(overlap_mask, stitched)
+        warped.copyTo(no_overlap, stitched)
+        
+        return stitched.download()
+    
     def calculate_quality_score(self, img1: np.ndarray, img2: np.ndarray, 
                                kp1: list, kp2: list, matches: list, 
-                               H: Optional[np.ndarray]) -> float:
+                               H: Optional[np.ndarray],
+                               mask: Optional[np.ndarray] = None) -> float:
         """
         Calculate quality score for stitching configuration.
         Higher score = better stitching quality.
+        Pass the inlier mask from verify_overlap to skip a second RANSAC run.
         """
         if H is None or len(matches) == 0:
             return 0.0
         
-        # Extract matched points
-        src_pts = np.float32([kp1[m.queryIdx].pt for m in matches]).reshape(-1, 1, 2)
-        dst_pts = np.float32([kp2[m.trainIdx].pt for m in matches]).reshape(-1, 1, 2)
-        
-        # Compute homography to get inliers
-        _, mask = cv2.findHomography(src_pts, dst_pts, cv2.RANSAC, self.ransac_threshold)
+        if mask is None:
+            # Extract matched points
+            src_pts = np.float32([kp1[m.queryIdx].pt for m in matches]).reshape(-1, 1, 2)
+            dst_pts = np.float32([kp2[m.trainIdx].pt for m in matches]).reshape(-1, 1, 2)
+            
+            # Compute homography to get inliers
+            _, mask = cv2.findHomography(src_pts, dst_pts, cv2.RANSAC, self.ransac_threshold)
         
         inlier_count = np.sum(mask)
         match_ratio = inlier_count / len(matches) if matches else 0
@@ -188,9 +308,9 @@ class ImageStitcher:
         
         # Configuration 1: Stitch img1 onto img2
         matches_1to2 = self.match_features(desc1, desc2)
-        is_overlap_1to2, H_1to2 = self.verify_overlap(img1, img2, kp1, kp2, matches_1to2)
+        is_overlap_1to2, H_1to2, mask_1to2 = self.verify_overlap(img1, img2, kp1, kp2, matches_1to2)
         
-        score_1to2 = self.calculate_quality_score(img1, img2, kp1, kp2, matches_1to2, H_1to2)
+        score_1to2 = self.calculate_quality_score(img1, img2, kp1, kp2, matches_1to2, H_1to2, mask_1to2)
         
         if is_overlap_1to2 and score_1to2 > best_score:
             best_score = score_1to2
@@ -199,9 +319,9 @@ class ImageStitcher:
         
         # Configuration 2: Stitch img2 onto img1 (reverse order)
         matches_2to1 = self.match_features(desc2, desc1)
-        is_overlap_2to1, H_2to1 = self.verify_overlap(img2, img1, kp2, kp1, matches_2to1)
+        is_overlap_2to1, H_2to1, mask_2to1 = self.verify_overlap(img2, img1, kp2, kp1, matches_2to1)
         
-        score_2to1 = self.calculate_quality_score(img2, img1, kp2, kp1, matches_2to1, H_2to1)
+        score_2to1 = self.calculate_quality_score(img2, img1, kp2, kp1, matches_2to1, H_2to1, mask_2to1)
         
         if is_overlap_2to1 and score_2to1 > best_score:
             best_score = score_2to1